@@ -1,18 +1,58 @@
 # app.py
 import os
+import atexit
+import time
+import queue
 import logging
-from flask import Flask, jsonify
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from flask import Flask, jsonify, request
+from werkzeug.exceptions import HTTPException, NotFound
 from flask_cors import CORS
+from flask_compress import Compress
 
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configuration du logging: les threads de requête déposent les enregistrements
+# dans une file, un thread dédié se charge de l'écriture sur stderr
+_log_listener = None
+
+def _configure_logging():
+    from config import get_settings
+    settings = get_settings()
+    default_level = "INFO" if settings.get("DEBUG", "False").lower() == "true" else "WARNING"
+    level = (settings.get("LOG_LEVEL") or default_level).upper()
+    
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    
+    queue_handler = QueueHandler(queue.SimpleQueue())
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    
+    def start_listener():
+        # Une file et un thread d'écriture par processus: le thread ne survit pas au fork
+        # (workers gunicorn avec preload_app), la copie de la file ne serait jamais lue
+        global _log_listener
+        queue_handler.queue = queue.SimpleQueue()
+        _log_listener = QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+        _log_listener.start()
+    
+    start_listener()
+    os.register_at_fork(after_in_child=start_listener)
+    atexit.register(lambda: _log_listener.stop())
+
+_configure_logging()
 logger = logging.getLogger(__name__)
 
-def create_app(config_class='config.Config'):
-    """Création et configuration de l'application Flask"""
+def create_app(config_class='config.Config', load_services=True):
+    """
+    Création et configuration de l'application Flask
+    
+    Args:
+        config_class: Classe de configuration à charger
+        load_services: Si False, les services lourds ne sont pas lancés; il faut alors
+                       appeler start_services(app) (ex: après le fork d'un worker gunicorn)
+    """
     
     # Initialiser l'application Flask
     app = Flask(__name__)
@@ -20,67 +60,204 @@ def create_app(config_class='config.Config'):
     # Charger la configuration
     app.config.from_object(config_class)
     
+    # Sérialisation JSON avec orjson
+    from utils.json_provider import ORJSONProvider
+    app.json = ORJSONProvider(app)
+    
+    # Créer les dossiers de travail (une seule fois, au démarrage)
+    from config import ensure_dirs
+    ensure_dirs(app.config)
+    
     # Activer CORS pour permettre les requêtes cross-origin
     CORS(app, resources={r"/api/*": {"origins": "*"}})
     
+    # Compresser les réponses JSON volumineuses (listes de personnes)
+    Compress(app)
+    
     # Initialiser la base de données
     from models.database import init_db
     init_db(app)
     
-    # Initialiser le stockage vectoriel
+    # Les services lourds (ChromaDB, InsightFace) sont chargés en arrière-plan
+    # pour que le serveur écoute immédiatement; /health/ready indique la fin du chargement
+    app.ready_event = threading.Event()
+    # Renseigné si l'initialisation des services a définitivement échoué
+    app.init_error = None
+    app.vector_store = None
+    app.face_service = None
+    app.person_service = None
+
+    # Enregistrer les routes
+    from routes import init_routes
+    init_routes(app)
+    
+    # Route par défaut
+    @app.route('/')
+    def index():
+        return jsonify({
+            "message": "API de reconnaissance faciale et de stockage d'empreintes digitales",
+            "version": "1.1.0"
+        })
+    
+    # Sondes de santé pour l'orchestrateur
+    @app.route('/health/live')
+    def health_live():
+        # Sans services, le processus ne répondrait plus que 503: le faire redémarrer
+        if app.init_error is not None:
+            return jsonify({"status": "failed", "error": app.init_error}), 503
+        return jsonify({"status": "alive"}), 200
+    
+    @app.route('/health/ready')
+    def health_ready():
+        if not app.ready_event.is_set():
+            return jsonify({"status": "loading"}), 503
+        return jsonify({"status": "ready"}), 200
+    
+    # Métriques internes (caches d'embeddings et de résultats d'identification)
+    @app.route('/metrics')
+    def metrics():
+        if not app.ready_event.is_set():
+            return jsonify({"status": "loading"}), 503
+        result_cache = app.person_service.result_cache
+        return jsonify({
+            "embedding_cache": app.face_service.cache_stats(),
+            "result_cache": result_cache.stats() if result_cache is not None else None
+        }), 200
+    
+    # Gestionnaire d'erreur pour les routes non trouvées (ou abort(404, message))
+    @app.errorhandler(404)
+    def not_found(error):
+        if error.description == NotFound.description:
+            return jsonify({"error": "Route non trouvée"}), 404
+        return jsonify({"error": error.description}), 404
+    
+    # Erreurs HTTP levées par abort() dans les routes
+    @app.errorhandler(HTTPException)
+    def handle_http_exception(error):
+        return jsonify({"error": error.description}), error.code
+    
+    # Gestionnaire d'erreur général: les routes ne capturent plus les exceptions elles-mêmes
+    @app.errorhandler(Exception)
+    def handle_exception(error):
+        logger.error(f"Erreur non gérée sur {request.method} {request.path}: {error}")
+        return jsonify({"error": "Erreur interne du serveur"}), 500
+    
+    # Charger les services lourds sans bloquer le démarrage du serveur
+    if load_services:
+        start_services(app)
+    
+    return app
+
+# Tentatives d'initialisation des services (ex: base ou ChromaDB pas encore joignable au
+# démarrage), espacées de INIT_RETRY_DELAY secondes doublées à chaque échec
+INIT_ATTEMPTS = 5
+INIT_RETRY_DELAY = 2.0
+
+def start_services(app):
+    """Lance l'initialisation des services lourds dans un thread d'arrière-plan"""
+    # Oublier (sans les fermer) les connexions héritées du processus maître (db.create_all):
+    # une socket libpq partagée par plusieurs workers corromprait le protocole
+    from models.database import db
+    with app.app_context():
+        db.engine.dispose(close=False)
+    threading.Thread(target=_init_with_retries, args=(app,), daemon=True).start()
+
+def _init_with_retries(app):
+    """
+    Initialise les services en réessayant après un échec transitoire; après la dernière
+    tentative, /health/live renvoie 503 pour que l'orchestrateur redémarre le processus
+    """
+    delay = INIT_RETRY_DELAY
+    for attempt in range(1, INIT_ATTEMPTS + 1):
+        try:
+            _deferred_init(app)
+            return
+        except Exception as e:
+            logger.error(f"Erreur lors de l'initialisation des services (tentative {attempt}/{INIT_ATTEMPTS}): {e}")
+            if attempt == INIT_ATTEMPTS:
+                app.init_error = str(e)
+                return
+            time.sleep(delay)
+            delay *= 2
+
+def _deferred_init(app):
+    """Initialise les services lourds puis signale que l'application est prête (lève en cas d'échec)"""
+    started = time.monotonic()
+    # Ouvrir une première connexion du pool PostgreSQL (connexion + authentification)
+    # pour que la première requête ne la paie pas
+    from models.database import db
+    with app.app_context():
+        db.session.execute(db.text("SELECT 1"))
+    
+    # Initialiser le stockage vectoriel (charge les embeddings en mémoire)
     from models.vector_store import VectorStore
     vector_store = VectorStore(
         app.config['CHROMA_DB_DIR'],
-        app.config['CHROMA_COLLECTION']
+        app.config['CHROMA_COLLECTION'],
+        host=app.config['CHROMA_HOST'],
+        port=app.config['CHROMA_PORT'],
+        exact_search_max=app.config['EXACT_SEARCH_MAX'],
+        hnsw_m=app.config['HNSW_M'],
+        hnsw_construction_ef=app.config['HNSW_CONSTRUCTION_EF'],
+        hnsw_search_ef=app.config['HNSW_SEARCH_EF']
     )
     
     # Initialiser le service de reconnaissance faciale
     from services.face_service import FaceService
     face_service = FaceService(
-        model_name=app.config['INSIGHTFACE_MODEL']
+        model_name=app.config['INSIGHTFACE_MODEL'],
+        cache_size=app.config['EMBEDDING_CACHE_SIZE'],
+        providers=app.config['INSIGHTFACE_PROVIDERS'],
+        inference_concurrency=app.config['INFERENCE_CONCURRENCY'],
+        det_size=app.config['DET_SIZE'],
+        fast_det_size=app.config['IDENTIFY_DET_SIZE']
     )
     
+    # Cache des résultats d'identification (visages quasi identiques)
+    result_cache = None
+    if app.config['RESULT_CACHE_SIZE'] > 0:
+        from utils.sim_cache import SimilarityCache
+        result_cache = SimilarityCache(
+            capacity=app.config['RESULT_CACHE_SIZE'],
+            max_distance=app.config['RESULT_CACHE_DISTANCE'],
+            ttl=app.config['RESULT_CACHE_TTL']
+        )
+    
     # Initialiser le service de gestion des personnes
     from services.person_service import PersonService
     person_service = PersonService(
         vector_store=vector_store,
         face_service=face_service,
         upload_folder=app.config['UPLOAD_FOLDER'],
-        fingerprints_folder=app.config['FINGERPRINTS_FOLDER']
+        fingerprints_folder=app.config['FINGERPRINTS_FOLDER'],
+        result_cache=result_cache,
+        embedding_workers=app.config['EMBEDDING_WORKERS']
     )
+    person_service.purge_temp_files()
+    # Reprendre les créations asynchrones interrompues par un redémarrage
+    person_service.resume_pending_embeddings(app)
     
     # Rendre les services accessibles dans l'application
     app.vector_store = vector_store
     app.face_service = face_service
     app.person_service = person_service
     
-    # Enregistrer les routes
-    from routes import init_routes
-    init_routes(app)
+    from routes.api import api
+    api.person_service = person_service
+    api.face_service = face_service
+    api.similarity_threshold = app.config['SIMILARITY_THRESHOLD']
     
-    # Route par défaut
-    @app.route('/')
-    def index():
-        return jsonify({
-            "message": "API de reconnaissance faciale et de stockage d'empreintes digitales",
-            "version": "1.1.0"
-        })
-    
-    # Gestionnaire d'erreur pour les routes non trouvées
-    @app.errorhandler(404)
-    def not_found(error):
-        return jsonify({"error": "Route non trouvée"}), 404
-    
-    # Gestionnaire d'erreur général
-    @app.errorhandler(Exception)
-    def handle_exception(error):
-        logger.error(f"Erreur non gérée: {error}")
-        return jsonify({"error": "Erreur interne du serveur"}), 500
-    
-    return app
+    app.ready_event.set()
+    logger.info(
+        "Services initialisés en %.1f s (%d embedding(s) indexé(s)), application prête",
+        time.monotonic() - started, vector_store.collection.count()
+    )
 
 if __name__ == '__main__':
+    # Serveur de développement uniquement; en production: gunicorn -c gunicorn_conf.py
     app = create_app()
+    if not app.config['DEBUG']:
+        logger.warning("Serveur de développement Werkzeug: utilisez gunicorn -c gunicorn_conf.py en production")
     # Récupérer le port depuis les variables d'environnement ou utiliser 5000 par défaut
     port = int(os.environ.get("PORT", 5000))
-    app.run(host='0.0.0.0', port=port, debug=app.config['DEBUG'])
\ No newline at end of file
+    app.run(host='0.0.0.0', port=port, debug=app.config['DEBUG'], threaded=True)
\ No newline at end of file
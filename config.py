@@ -1,47 +1,113 @@
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
 
 # Chargement des variables d'environnement
 load_dotenv()
 
+@lru_cache(maxsize=None)
+def get_settings():
+    """Lit une seule fois les variables d'environnement et renvoie un instantané"""
+    return dict(os.environ)
+
+_settings = get_settings()
+
 class Config:
     # Configuration de Flask
-    SECRET_KEY = os.environ.get("SECRET_KEY") or "clé-secrète-par-défaut"
-    DEBUG = os.environ.get("DEBUG", "False").lower() == "true"
+    SECRET_KEY = _settings.get("SECRET_KEY") or "clé-secrète-par-défaut"
+    DEBUG = _settings.get("DEBUG", "False").lower() == "true"
     
     # Configuration de la base de données PostgreSQL
-    DB_USER = os.environ.get("DB_USER") or "face_user"
-    DB_PASSWORD = os.environ.get("DB_PASSWORD") or "mlkiop"
-    DB_HOST = os.environ.get("DB_HOST") or "localhost"
-    DB_PORT = os.environ.get("DB_PORT") or "5432"
-    DB_NAME = os.environ.get("DB_NAME") or "face_recognition"
+    DB_USER = _settings.get("DB_USER") or "face_user"
+    DB_PASSWORD = _settings.get("DB_PASSWORD") or "mlkiop"
+    DB_HOST = _settings.get("DB_HOST") or "localhost"
+    DB_PORT = _settings.get("DB_PORT") or "5432"
+    DB_NAME = _settings.get("DB_NAME") or "face_recognition"
     
-    SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URI") or \
+    SQLALCHEMY_DATABASE_URI = _settings.get("DATABASE_URI") or \
         f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = DEBUG
-    
+
+    # Pool de connexions PostgreSQL (réutilisation, détection des connexions mortes)
+    if SQLALCHEMY_DATABASE_URI.startswith("postgresql"):
+        SQLALCHEMY_ENGINE_OPTIONS = {
+            "pool_size": int(_settings.get("DB_POOL_SIZE") or 10),
+            "max_overflow": int(_settings.get("DB_MAX_OVERFLOW") or 20),
+            "pool_timeout": 30,
+            "pool_recycle": 1800,
+            "pool_pre_ping": True
+        }
+
     # Reste de votre configuration existante...
-    CHROMA_DB_DIR = os.environ.get("CHROMA_DB_DIR") or "chroma_db"
-    CHROMA_COLLECTION = os.environ.get("CHROMA_COLLECTION") or "face_embeddings"
+    CHROMA_DB_DIR = _settings.get("CHROMA_DB_DIR") or "chroma_db"
+    CHROMA_COLLECTION = _settings.get("CHROMA_COLLECTION") or "face_embeddings"
+    # Serveur ChromaDB (optionnel): si CHROMA_HOST est défini, le mode client/serveur est utilisé
+    CHROMA_HOST = _settings.get("CHROMA_HOST")
+    CHROMA_PORT = int(_settings.get("CHROMA_PORT") or 8000)
+    # Taille maximale de collection pour la recherche exacte en mémoire (au-delà: HNSW)
+    EXACT_SEARCH_MAX = int(_settings.get("EXACT_SEARCH_MAX") or 200000)
+    # Paramètres de l'index HNSW de Chroma, pris en compte à la création de la collection:
+    # voisins par nœud, candidats à l'insertion, candidats à la recherche (rappel/latence)
+    HNSW_M = int(_settings.get("HNSW_M") or 16)
+    HNSW_CONSTRUCTION_EF = int(_settings.get("HNSW_CONSTRUCTION_EF") or 200)
+    HNSW_SEARCH_EF = int(_settings.get("HNSW_SEARCH_EF") or 64)
     
     # Configuration des dossiers de téléchargements
-    UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER") or "static/uploads"
-    FINGERPRINTS_FOLDER = os.environ.get("FINGERPRINTS_FOLDER") or "static/fingerprints"
+    UPLOAD_FOLDER = _settings.get("UPLOAD_FOLDER") or "static/uploads"
+    FINGERPRINTS_FOLDER = _settings.get("FINGERPRINTS_FOLDER") or "static/fingerprints"
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'bmp'}
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
+    # Taille des blocs lus lors de l'analyse des formulaires multipart (1 MiB par défaut)
+    MULTIPART_CHUNK_SIZE = int(_settings.get("MULTIPART_CHUNK_SIZE") or 1024 * 1024)
+    # Taille maximale gardée en mémoire par fichier téléchargé avant écriture sur disque
+    MULTIPART_SPOOL_SIZE = int(_settings.get("MULTIPART_SPOOL_SIZE") or 1024 * 1024)
+    # Déléguer l'envoi des fichiers au serveur frontal (nginx/Apache) via X-Sendfile
+    USE_X_SENDFILE = _settings.get("USE_X_SENDFILE", "False").lower() == "true"
+    # nginx: préfixe d'une location "internal" servant les fichiers via X-Accel-Redirect
+    # (ex: /_protected/), et dossier local auquel cette location correspond
+    X_ACCEL_REDIRECT_PREFIX = _settings.get("X_ACCEL_REDIRECT_PREFIX")
+    X_ACCEL_ROOT = _settings.get("X_ACCEL_ROOT") or "static"
+    # Durée (secondes) pendant laquelle les clients peuvent réutiliser une image sans revalidation
+    IMAGE_CACHE_MAX_AGE = int(_settings.get("IMAGE_CACHE_MAX_AGE") or 3600)
     
-    # Configuration InsightFace
-    INSIGHTFACE_MODEL = os.environ.get("INSIGHTFACE_MODEL") or "buffalo_l"
-    SIMILARITY_THRESHOLD = float(os.environ.get("SIMILARITY_THRESHOLD") or 0.6)
+    # Compression des réponses JSON (les images envoyées par send_file sont déjà compressées)
+    COMPRESS_MIMETYPES = ['application/json']
+    COMPRESS_ALGORITHM = ['br', 'gzip']
+    COMPRESS_LEVEL = 5
+    COMPRESS_BR_LEVEL = 5
+    COMPRESS_MIN_SIZE = 1024
+    # Les réponses envoyées par morceaux (GET /persons) ne sont pas mises en tampon pour
+    # être compressées; le serveur frontal peut les compresser au fil de l'eau
+    COMPRESS_STREAMS = False
     
-    # Crée les dossiers s'ils n'existent pas
-    if not os.path.exists(UPLOAD_FOLDER):
-        os.makedirs(UPLOAD_FOLDER)
-    if not os.path.exists(FINGERPRINTS_FOLDER):
-        os.makedirs(FINGERPRINTS_FOLDER)
+    # Configuration InsightFace
+    INSIGHTFACE_MODEL = _settings.get("INSIGHTFACE_MODEL") or "buffalo_l"
+    # Fournisseurs ONNX Runtime par ordre de préférence, séparés par des virgules
+    # (ex: TensorrtExecutionProvider,CUDAExecutionProvider,CPUExecutionProvider)
+    INSIGHTFACE_PROVIDERS = [
+        p.strip() for p in (_settings.get("INSIGHTFACE_PROVIDERS") or "CPUExecutionProvider").split(",") if p.strip()
+    ]
+    SIMILARITY_THRESHOLD = float(_settings.get("SIMILARITY_THRESHOLD") or 0.6)
+    # Résolution de détection des visages: enregistrement / identification et /process
+    DET_SIZE = int(_settings.get("DET_SIZE") or 640)
+    IDENTIFY_DET_SIZE = int(_settings.get("IDENTIFY_DET_SIZE") or 320)
+    # Inférences InsightFace simultanées par processus (les autres requêtes attendent)
+    INFERENCE_CONCURRENCY = int(_settings.get("INFERENCE_CONCURRENCY") or 1)
+    EMBEDDING_CACHE_SIZE = int(_settings.get("EMBEDDING_CACHE_SIZE") or 1024)
+    # Threads calculant les embeddings des créations asynchrones (POST /persons?async=true)
+    EMBEDDING_WORKERS = int(_settings.get("EMBEDDING_WORKERS") or 2)
+    # Cache des résultats d'identification pour les visages quasi identiques (0 pour désactiver)
+    RESULT_CACHE_SIZE = int(_settings.get("RESULT_CACHE_SIZE") or 256)
+    RESULT_CACHE_DISTANCE = float(_settings.get("RESULT_CACHE_DISTANCE") or 0.02)
+    RESULT_CACHE_TTL = float(_settings.get("RESULT_CACHE_TTL") or 30)
 
     # Configuration pour les journaux d'activité
-    LOG_DIR = os.environ.get("LOG_DIR") or "logs"
-    if not os.path.exists(LOG_DIR):
-        os.makedirs(LOG_DIR)
\ No newline at end of file
+    LOG_DIR = _settings.get("LOG_DIR") or "logs"
+    # Durée (secondes) de réutilisation des statistiques du tableau de bord (0 pour désactiver)
+    DASHBOARD_CACHE_TTL = float(_settings.get("DASHBOARD_CACHE_TTL") or 30)
+
+def ensure_dirs(config):
+    """Crée les dossiers de l'application s'ils n'existent pas"""
+    for key in ('UPLOAD_FOLDER', 'FINGERPRINTS_FOLDER', 'LOG_DIR'):
+        os.makedirs(config[key], exist_ok=True)
\ No newline at end of file
@@ -0,0 +1,38 @@
+# gunicorn_conf.py
+# Lancement en production: gunicorn -c gunicorn_conf.py
+import os
+import logging
+
+from config import get_settings
+
+_settings = get_settings()
+
+# Application: les services lourds ne sont pas chargés dans le processus maître
+wsgi_app = "app:create_app(load_services=False)"
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Le code Python et Flask est importé une seule fois dans le maître puis partagé
+# (copie sur écriture) avec les workers
+preload_app = True
+
+workers = int(os.environ.get("WEB_CONCURRENCY", "4"))
+# Le client ChromaDB embarqué (CHROMA_HOST non défini) ne supporte pas plusieurs processus
+# écrivant dans le même CHROMA_DB_DIR: plusieurs workers nécessitent le serveur ChromaDB
+# (service "chroma" de docker-compose.yml, avec CHROMA_HOST=localhost)
+if not _settings.get("CHROMA_HOST") and workers > 1:
+    logging.getLogger(__name__).warning(
+        "CHROMA_HOST non défini: ChromaDB embarqué, lancement avec 1 worker au lieu de %d", workers
+    )
+    workers = 1
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+timeout = 60
+
+def post_fork(server, worker):
+    """
+    Charge ChromaDB et InsightFace dans chaque worker après le fork:
+    ni le client ChromaDB embarqué ni les sessions ONNX ne supportent le fork
+    """
+    from app import start_services
+    start_services(worker.app.wsgi())
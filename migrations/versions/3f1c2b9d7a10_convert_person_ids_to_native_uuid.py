@@ -0,0 +1,47 @@
+"""Convert person ids to native UUID
+
+Revision ID: 3f1c2b9d7a10
+Revises: e36da302aeb4
+Create Date: 2026-10-15 10:12:41.208113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2b9d7a10'
+down_revision: Union[str, None] = 'e36da302aeb4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.alter_column('person', 'id',
+               existing_type=sa.String(length=36),
+               type_=postgresql.UUID(as_uuid=True),
+               postgresql_using='id::uuid',
+               existing_nullable=False)
+    op.alter_column('person', 'vector_id',
+               existing_type=sa.String(length=36),
+               type_=postgresql.UUID(as_uuid=True),
+               postgresql_using='vector_id::uuid',
+               existing_nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column('person', 'vector_id',
+               existing_type=postgresql.UUID(as_uuid=True),
+               type_=sa.String(length=36),
+               postgresql_using='vector_id::text',
+               existing_nullable=False)
+    op.alter_column('person', 'id',
+               existing_type=postgresql.UUID(as_uuid=True),
+               type_=sa.String(length=36),
+               postgresql_using='id::text',
+               existing_nullable=False)
@@ -0,0 +1,52 @@
+"""Use server defaults for person ids and timestamps
+
+Revision ID: 8b4e1d2f6c35
+Revises: 3f1c2b9d7a10
+Create Date: 2026-10-15 11:04:19.532870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b4e1d2f6c35'
+down_revision: Union[str, None] = '3f1c2b9d7a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # gen_random_uuid() est intégré à PostgreSQL 13+ (l'image du projet est postgres:15)
+    op.alter_column('person', 'id',
+               existing_type=postgresql.UUID(as_uuid=True),
+               server_default=sa.text('gen_random_uuid()'),
+               existing_nullable=False)
+    op.alter_column('person', 'created_at',
+               existing_type=sa.DateTime(),
+               server_default=sa.text("timezone('utc', now())"),
+               existing_nullable=True)
+    op.alter_column('person', 'updated_at',
+               existing_type=sa.DateTime(),
+               server_default=sa.text("timezone('utc', now())"),
+               existing_nullable=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column('person', 'updated_at',
+               existing_type=sa.DateTime(),
+               server_default=None,
+               existing_nullable=True)
+    op.alter_column('person', 'created_at',
+               existing_type=sa.DateTime(),
+               server_default=None,
+               existing_nullable=True)
+    op.alter_column('person', 'id',
+               existing_type=postgresql.UUID(as_uuid=True),
+               server_default=None,
+               existing_nullable=False)
@@ -0,0 +1,30 @@
+"""Add check constraint vector_id = id
+
+Revision ID: a91d5c7e2f48
+Revises: f2a8c6d41b97
+Create Date: 2026-10-15 18:47:26.104519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a91d5c7e2f48'
+down_revision: Union[str, None] = 'f2a8c6d41b97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # L'application a toujours créé les personnes avec vector_id = id; l'identification
+    # ne cherche plus que par id
+    op.create_check_constraint('ck_person_vector_id_is_id', 'person', 'vector_id = id')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('ck_person_vector_id_is_id', 'person', type_='check')
@@ -0,0 +1,37 @@
+"""Drop person id server default
+
+Revision ID: b5d2e8f1a093
+Revises: a91d5c7e2f48
+Create Date: 2026-10-15 18:42:07.114326
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d2e8f1a093'
+down_revision: Union[str, None] = 'a91d5c7e2f48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # L'identifiant est toujours fourni par l'application (contrainte vector_id = id):
+    # gen_random_uuid() n'était jamais évalué
+    op.alter_column('person', 'id',
+               existing_type=postgresql.UUID(as_uuid=True),
+               server_default=None,
+               existing_nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column('person', 'id',
+               existing_type=postgresql.UUID(as_uuid=True),
+               server_default=sa.text('gen_random_uuid()'),
+               existing_nullable=False)
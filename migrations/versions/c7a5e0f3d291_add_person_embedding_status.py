@@ -0,0 +1,29 @@
+"""Add person embedding status
+
+Revision ID: c7a5e0f3d291
+Revises: 8b4e1d2f6c35
+Create Date: 2026-10-15 14:22:07.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7a5e0f3d291'
+down_revision: Union[str, None] = '8b4e1d2f6c35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Les personnes existantes ont toutes un embedding dans ChromaDB
+    op.add_column('person', sa.Column('embedding_status', sa.String(length=10), server_default='ready', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('person', 'embedding_status')
@@ -0,0 +1,29 @@
+"""Add person created_at index
+
+Revision ID: d4e9b7a1c382
+Revises: c7a5e0f3d291
+Create Date: 2026-10-15 16:05:41.227913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4e9b7a1c382'
+down_revision: Union[str, None] = 'c7a5e0f3d291'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Statistiques du tableau de bord: comptages par intervalle de date d'inscription
+    op.create_index(op.f('ix_person_created_at'), 'person', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_person_created_at'), table_name='person')
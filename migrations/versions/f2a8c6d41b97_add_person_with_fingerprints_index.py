@@ -0,0 +1,35 @@
+"""Add partial index on persons with fingerprints
+
+Revision ID: f2a8c6d41b97
+Revises: d4e9b7a1c382
+Create Date: 2026-10-15 18:12:09.532871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a8c6d41b97'
+down_revision: Union[str, None] = 'd4e9b7a1c382'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # GET /persons/with-fingerprints: seules les lignes ayant une empreinte sont indexées
+    op.create_index(
+        'ix_person_with_fingerprints', 'person', ['id'], unique=False,
+        postgresql_where=sa.text(
+            'fingerprint_right_data IS NOT NULL OR fingerprint_left_data IS NOT NULL '
+            'OR fingerprint_thumbs_data IS NOT NULL'
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_person_with_fingerprints', table_name='person')
@@ -1,7 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
 
 # Instance de la base de données
-db = SQLAlchemy()
+# expire_on_commit=False: les objets restent utilisables après commit sans
+# nouvel aller-retour vers PostgreSQL (ex: sérialisation après création)
+db = SQLAlchemy(session_options={"expire_on_commit": False})
 
 def init_db(app):
     """Initialise la base de données avec l'application Flask"""
@@ -1,13 +1,39 @@
 # models/person.py
-from datetime import datetime
 from .database import db
-import uuid
-import base64
+import mmap
+import mimetypes
+import pybase64
+
+# Heure courante UTC côté PostgreSQL (colonnes "timestamp without time zone")
+UTC_NOW = db.text("timezone('utc', now())")
+
+# Types d'empreintes: (suffixe d'URL, indicateur de présence en base, chemin sur disque)
+FINGERPRINT_KINDS = (
+    ('right', 'has_fingerprint_right', 'fingerprint_right_path'),
+    ('left', 'has_fingerprint_left', 'fingerprint_left_path'),
+    ('thumbs', 'has_fingerprint_thumbs', 'fingerprint_thumbs_path')
+)
+
+def _encode_file(path):
+    """
+    Encode un fichier en base64 en le projetant en mémoire (mmap), sans copie
+    intermédiaire de son contenu en bytes
+    
+    Returns:
+        str ou None si le fichier est absent ou vide
+    """
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return pybase64.b64encode(mm).decode('ascii')
+    except (OSError, ValueError):
+        return None
 
 class Person(db.Model):
     """Modèle de données pour une personne"""
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    # UUID natif (16 octets sous PostgreSQL) plutôt qu'une chaîne de 36 caractères, toujours
+    # fourni par l'application: il sert aussi d'identifiant vectoriel (vector_id = id)
+    id = db.Column(db.Uuid(as_uuid=True), primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     age = db.Column(db.Integer, nullable=False)
     gender = db.Column(db.String(20), nullable=False)
@@ -20,21 +46,46 @@ class Person(db.Model):
     fingerprint_thumbs_path = db.Column(db.Text, nullable=True)
     
     # Nouveaux champs pour stocker les images directement en base de données
-    photo_data = db.Column(db.LargeBinary, nullable=True)  # Photo du visage en binaire
+    # (chargement différé: les BLOB ne sont lus que lorsqu'ils sont réellement utilisés)
+    photo_data = db.mapped_column(db.LargeBinary, nullable=True, deferred=True)  # Photo du visage en binaire
     photo_mime_type = db.Column(db.String(30), nullable=True)  # Type MIME de la photo
     
-    fingerprint_right_data = db.Column(db.LargeBinary, nullable=True)  # Empreinte droite en binaire
+    fingerprint_right_data = db.mapped_column(db.LargeBinary, nullable=True, deferred=True)  # Empreinte droite en binaire
     fingerprint_right_mime_type = db.Column(db.String(30), nullable=True)
     
-    fingerprint_left_data = db.Column(db.LargeBinary, nullable=True)  # Empreinte gauche en binaire
+    fingerprint_left_data = db.mapped_column(db.LargeBinary, nullable=True, deferred=True)  # Empreinte gauche en binaire
     fingerprint_left_mime_type = db.Column(db.String(30), nullable=True)
     
-    fingerprint_thumbs_data = db.Column(db.LargeBinary, nullable=True)  # Empreinte pouces en binaire
+    fingerprint_thumbs_data = db.mapped_column(db.LargeBinary, nullable=True, deferred=True)  # Empreinte pouces en binaire
     fingerprint_thumbs_mime_type = db.Column(db.String(30), nullable=True)
     
-    vector_id = db.Column(db.String(36), unique=True, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Présence des images calculée en SQL, sans charger les BLOB
+    has_photo = db.column_property(photo_data.column.isnot(None))
+    has_fingerprint_right = db.column_property(fingerprint_right_data.column.isnot(None))
+    has_fingerprint_left = db.column_property(fingerprint_left_data.column.isnot(None))
+    has_fingerprint_thumbs = db.column_property(fingerprint_thumbs_data.column.isnot(None))
+    
+    vector_id = db.Column(db.Uuid(as_uuid=True), unique=True, nullable=False)
+    # État de l'embedding facial: 'pending' (calcul en arrière-plan), 'ready' ou 'failed'
+    embedding_status = db.Column(db.String(10), nullable=False, default='ready', server_default='ready')
+    # Horodatages UTC fournis par PostgreSQL (horloge unique pour tous les workers)
+    created_at = db.Column(db.DateTime, server_default=UTC_NOW, index=True)
+    updated_at = db.Column(db.DateTime, server_default=UTC_NOW, onupdate=UTC_NOW)
+    
+    # Index partiel des personnes ayant au moins une empreinte (GET /persons/with-fingerprints):
+    # PostgreSQL parcourt l'index au lieu de toute la table
+    __table_args__ = (
+        db.Index(
+            'ix_person_with_fingerprints', 'id',
+            postgresql_where=db.or_(
+                fingerprint_right_data.column.isnot(None),
+                fingerprint_left_data.column.isnot(None),
+                fingerprint_thumbs_data.column.isnot(None)
+            )
+        ),
+        # Les identifiants ChromaDB sont les ID des personnes: une seule clé de recherche
+        db.CheckConstraint('vector_id = id', name='ck_person_vector_id_is_id'),
+    )
     
     def __repr__(self):
         return f"<Person {self.name}, {self.age} ans>"
@@ -47,42 +98,55 @@ class Person(db.Model):
             include_image_data: Si True, inclut la photo du visage encodée en base64
             include_fingerprints: Si True, inclut aussi les empreintes digitales en base64
         """
+        person_id = str(self.id)
         person_dict = {
-            "id": self.id,
+            "id": person_id,
             "name": self.name,
             "age": self.age,
             "gender": self.gender,
             "nationality": self.nationality,
-            "vector_id": self.vector_id,
-            "created_at": self.created_at.isoformat(),
-            "updated_at": self.updated_at.isoformat()
+            "vector_id": str(self.vector_id),
+            # Les datetime sont sérialisés en ISO 8601 par le fournisseur JSON (orjson)
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
         }
         
-        # Ajouter les propriétés pour indiquer si les empreintes sont disponibles
-        has_fingerprints = any([
-            self.fingerprint_right_data is not None,
-            self.fingerprint_left_data is not None,
-            self.fingerprint_thumbs_data is not None
-        ])
+        # URLs pour récupérer les images en binaire (sans encodage base64)
+        if self.has_photo or self.photo_path:
+            person_dict["photo_url"] = f"/api/persons/{person_id}/photo"
+        
+        has_fingerprints = False
+        for kind, has_attr, path_attr in FINGERPRINT_KINDS:
+            if getattr(self, has_attr) or getattr(self, path_attr):
+                person_dict[f"fingerprint_{kind}_url"] = f"/api/persons/{person_id}/fingerprint/{kind}"
+                has_fingerprints = True
+        
+        # Indiquer si des empreintes sont disponibles
         person_dict["has_fingerprints"] = has_fingerprints
         
         # Ajouter la photo du visage encodée en base64 si demandé
         if include_image_data and self.photo_data is not None:
-            person_dict["photo_data"] = base64.b64encode(self.photo_data).decode('utf-8')
+            person_dict["photo_data"] = pybase64.b64encode(self.photo_data).decode('ascii')
             person_dict["photo_mime_type"] = self.photo_mime_type
+        elif include_image_data and self.photo_path:
+            # Anciennes personnes: photo stockée sur disque
+            encoded = _encode_file(self.photo_path)
+            if encoded is not None:
+                person_dict["photo_data"] = encoded
+                person_dict["photo_mime_type"] = mimetypes.guess_type(self.photo_path)[0] or 'application/octet-stream'
         
         # Ajouter les empreintes digitales encodées en base64 si demandé
         if include_fingerprints:
             if self.fingerprint_right_data is not None:
-                person_dict["fingerprint_right_data"] = base64.b64encode(self.fingerprint_right_data).decode('utf-8')
+                person_dict["fingerprint_right_data"] = pybase64.b64encode(self.fingerprint_right_data).decode('ascii')
                 person_dict["fingerprint_right_mime_type"] = self.fingerprint_right_mime_type
             
             if self.fingerprint_left_data is not None:
-                person_dict["fingerprint_left_data"] = base64.b64encode(self.fingerprint_left_data).decode('utf-8')
+                person_dict["fingerprint_left_data"] = pybase64.b64encode(self.fingerprint_left_data).decode('ascii')
                 person_dict["fingerprint_left_mime_type"] = self.fingerprint_left_mime_type
             
             if self.fingerprint_thumbs_data is not None:
-                person_dict["fingerprint_thumbs_data"] = base64.b64encode(self.fingerprint_thumbs_data).decode('utf-8')
+                person_dict["fingerprint_thumbs_data"] = pybase64.b64encode(self.fingerprint_thumbs_data).decode('ascii')
                 person_dict["fingerprint_thumbs_mime_type"] = self.fingerprint_thumbs_mime_type
         
         return person_dict
\ No newline at end of file
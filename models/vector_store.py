@@ -1,6 +1,9 @@
 import chromadb
 from chromadb.config import Settings
+import numpy as np
+import threading
 import logging
+import time
 import os
 
 logger = logging.getLogger(__name__)
@@ -8,117 +11,430 @@ logger = logging.getLogger(__name__)
 class VectorStore:
     """Interface avec ChromaDB pour stocker et rechercher des embeddings de visages"""
     
-    def __init__(self, db_directory, collection_name):
-        """Initialise le client ChromaDB et la collection"""
+    # Nombre d'identifiants par appel collection.delete() lors des suppressions groupées
+    BATCH_SIZE = 256
+    # Nombre de lignes déquantifiées à la fois lors d'une recherche exacte
+    SCORE_BLOCK = 8192
+    # Intervalle (en secondes) entre deux comparaisons de la matrice en mémoire avec la
+    # collection; les recherches concurrentes partagent le résultat de la dernière
+    MIRROR_CHECK_INTERVAL = 1.0
+    # Intervalle (en secondes) entre deux comparaisons des identifiants de la matrice avec
+    # ceux de la collection: détecte les changements d'un autre processus qui laissent le
+    # nombre d'embeddings inchangé (une suppression et un ajout entre deux vérifications)
+    MIRROR_SYNC_INTERVAL = 10.0
+    # Paramètres de construction de l'index HNSW de Chroma (grandes collections):
+    # M voisins par nœud, largeur de la liste de candidats à l'insertion
+    HNSW_M = 16
+    HNSW_CONSTRUCTION_EF = 200
+    # Largeur de la liste de candidats à la recherche: fixe, pour un rappel et une latence
+    # indépendants du nombre de résultats demandés (plus grand: meilleur rappel, plus lent)
+    HNSW_SEARCH_EF = 64
+    
+    def __init__(self, db_directory, collection_name, host=None, port=8000, exact_search_max=200000,
+                 hnsw_m=HNSW_M, hnsw_construction_ef=HNSW_CONSTRUCTION_EF, hnsw_search_ef=HNSW_SEARCH_EF):
+        """
+        Initialise le client ChromaDB et la collection
+        
+        Args:
+            db_directory: Dossier de persistance (mode embarqué)
+            collection_name: Nom de la collection
+            host: Hôte d'un serveur ChromaDB; si fourni, le client HTTP est utilisé
+                  à la place du client embarqué
+            port: Port du serveur ChromaDB
+            exact_search_max: Au-delà de ce nombre d'embeddings, la recherche exacte en
+                              mémoire est abandonnée au profit de l'index HNSW de Chroma
+            hnsw_m, hnsw_construction_ef, hnsw_search_ef: Paramètres de l'index HNSW, appliqués
+                              à la création de la collection
+        """
+        
+        # Copie en mémoire (quantifiée en int8, 4x plus compacte que float32) de tous
+        # les embeddings pour une recherche exacte par produit matriciel
+        self.exact_search_max = exact_search_max
+        self._mirror_lock = threading.RLock()
+        self._matrix = None
+        self._scales = np.zeros(0, dtype=np.float32)
+        self._ids = []
+        self._metadatas = []
+        self._rows = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._size = 0
+        self._mirror_checked_at = float('-inf')
+        self._mirror_synced_at = float('-inf')
+        self._mirror_usable = False
+        
+        # Ordonne les écritures dans la collection (ajouts et suppressions) et la mise à
+        # jour correspondante de la matrice en mémoire
+        self._write_lock = threading.Lock()
         
-        # S'assurer que le répertoire existe
-        if not os.path.exists(db_directory):
-            os.makedirs(db_directory)
-            
         # Initialiser le client ChromaDB
         try:
-            self.client = chromadb.PersistentClient(
-                path=db_directory,
-                settings=Settings(anonymized_telemetry=False)
-            )
+            if host:
+                # Mode serveur: l'indexation HNSW et la persistance tournent dans un
+                # processus séparé, les threads Flask ne font que des E/S réseau
+                self.client = chromadb.HttpClient(
+                    host=host,
+                    port=port,
+                    settings=Settings(anonymized_telemetry=False)
+                )
+            else:
+                # S'assurer que le répertoire existe
+                if not os.path.exists(db_directory):
+                    os.makedirs(db_directory)
+                
+                self.client = chromadb.PersistentClient(
+                    path=db_directory,
+                    settings=Settings(anonymized_telemetry=False)
+                )
             
             # Créer ou récupérer la collection
             self.collection = self.client.get_or_create_collection(
                 name=collection_name,
-                metadata={"hnsw:space": "cosine"}  # Utiliser la distance cosinus
+                # Produit scalaire: les embeddings étant normalisés (L2) côté client,
+                # il équivaut à la similarité cosinus sans renormalisation dans Chroma.
+                # Une collection existante conserve les paramètres avec lesquels elle a été créée.
+                metadata={
+                    "hnsw:space": "ip",
+                    "hnsw:M": hnsw_m,
+                    "hnsw:construction_ef": hnsw_construction_ef,
+                    "hnsw:search_ef": hnsw_search_ef
+                }
             )
             
             logger.info(f"Collection ChromaDB '{collection_name}' initialisée avec succès")
         except Exception as e:
             logger.error(f"Erreur lors de l'initialisation de ChromaDB: {e}")
             raise
+        
+        self._load_mirror()
+    
+    def _load_mirror(self):
+        """
+        Charge tous les embeddings de la collection dans la matrice en mémoire
+        
+        La collection est lue avant de prendre _mirror_lock: les recherches exactes en
+        cours ne sont pas bloquées pendant l'aller-retour vers ChromaDB.
+        """
+        count = self.collection.count()
+        data = None
+        if 0 < count <= self.exact_search_max:
+            data = self.collection.get(include=["embeddings", "metadatas"])
+        
+        with self._mirror_lock:
+            self._matrix = None
+            self._scales = np.zeros(0, dtype=np.float32)
+            self._ids = []
+            self._metadatas = []
+            self._rows = {}
+            self._alive = np.zeros(0, dtype=bool)
+            self._size = 0
+            
+            if data is None:
+                return
+            
+            if len(data["ids"]) > 0:
+                self._mirror_add(data["ids"], data["embeddings"], data["metadatas"])
+            self._mirror_synced_at = time.monotonic()
+        logger.info(f"{self._live_count()} embedding(s) chargé(s) en mémoire pour la recherche exacte")
+    
+    def _sync_mirror(self):
+        """
+        Aligne la matrice en mémoire sur les identifiants de la collection
+        
+        Seuls les identifiants sont lus; les embeddings ne sont rapatriés que pour les
+        ajouts d'autres processus. À appeler sous _write_lock: une écriture de ce
+        processus ne peut pas s'intercaler entre la lecture et la mise à jour.
+        _mirror_lock n'est pris que pour comparer et appliquer, jamais pendant un appel
+        à ChromaDB.
+        """
+        ids = self.collection.get(include=[])["ids"]
+        with self._mirror_lock:
+            known = set(ids)
+            removed = [vector_id for vector_id in self._rows if vector_id not in known]
+            added = [vector_id for vector_id in ids if vector_id not in self._rows]
+            if removed:
+                self._mirror_delete(removed)
+        
+        if added:
+            data = self.collection.get(ids=added, include=["embeddings", "metadatas"])
+            if len(data["ids"]) > 0:
+                self._mirror_add(data["ids"], data["embeddings"], data["metadatas"])
+        self._mirror_synced_at = time.monotonic()
+        
+        if removed or added:
+            logger.info("Matrice en mémoire resynchronisée: %d ajout(s), %d suppression(s)", len(added), len(removed))
+    
+    def _live_count(self):
+        """Nombre d'embeddings valides (non supprimés) dans la matrice en mémoire"""
+        return int(np.count_nonzero(self._alive[:self._size]))
+    
+    def _mirror_add(self, ids, embeddings, metadatas):
+        """Ajoute des embeddings à la matrice en mémoire (croissance amortie x2)"""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+        vectors, scales = self._quantize(vectors)
+        
+        with self._mirror_lock:
+            # Remplacer d'éventuelles versions précédentes des mêmes identifiants
+            self._mirror_delete(ids)
+            
+            needed = self._size + len(ids)
+            if self._matrix is None:
+                self._matrix = np.empty((max(needed, 1024), vectors.shape[1]), dtype=np.int8)
+                self._scales = np.ones(len(self._matrix), dtype=np.float32)
+                self._alive = np.zeros(len(self._matrix), dtype=bool)
+            elif needed > len(self._matrix):
+                capacity = max(needed, 2 * len(self._matrix))
+                matrix = np.empty((capacity, self._matrix.shape[1]), dtype=np.int8)
+                matrix[:self._size] = self._matrix[:self._size]
+                row_scales = np.ones(capacity, dtype=np.float32)
+                row_scales[:self._size] = self._scales[:self._size]
+                alive = np.zeros(capacity, dtype=bool)
+                alive[:self._size] = self._alive[:self._size]
+                self._matrix, self._scales, self._alive = matrix, row_scales, alive
+            
+            self._matrix[self._size:needed] = vectors
+            self._scales[self._size:needed] = scales
+            self._alive[self._size:needed] = True
+            for offset, vector_id in enumerate(ids):
+                self._rows[vector_id] = self._size + offset
+            self._ids.extend(ids)
+            self._metadatas.extend(metadatas)
+            self._size = needed
+    
+    @staticmethod
+    def _quantize(vectors):
+        """
+        Quantifie des vecteurs en int8 avec une échelle par vecteur
+        
+        Chaque vecteur est mis à l'échelle pour que sa plus grande composante (en valeur
+        absolue) vaille 127: toute la plage int8 est utilisée, alors que les composantes
+        d'un embedding normalisé de dimension 512 dépassent rarement 0.2.
+        
+        Returns:
+            tuple: (vecteurs int8, échelles float32 telles que vecteur ≈ int8 / échelle)
+        """
+        scales = 127.0 / (np.abs(vectors).max(axis=1) + 1e-12)
+        quantized = np.round(vectors * scales[:, None]).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+    
+    def _mirror_delete(self, ids):
+        """Marque des embeddings comme supprimés; compacte la matrice si nécessaire"""
+        with self._mirror_lock:
+            for vector_id in ids:
+                row = self._rows.pop(vector_id, None)
+                if row is not None:
+                    self._alive[row] = False
+            
+            # Compacter lorsque plus de la moitié des lignes sont supprimées
+            if self._size > 1024 and self._live_count() < self._size // 2:
+                keep = np.nonzero(self._alive[:self._size])[0]
+                self._matrix[:len(keep)] = self._matrix[keep]
+                self._scales[:len(keep)] = self._scales[keep]
+                self._alive[:] = False
+                self._alive[:len(keep)] = True
+                self._ids = [self._ids[i] for i in keep]
+                self._metadatas = [self._metadatas[i] for i in keep]
+                self._rows = {vector_id: row for row, vector_id in enumerate(self._ids)}
+                self._size = len(keep)
     
     def add_embedding(self, person_id, embedding, metadata):
-        """Ajoute un embedding à la collection avec les métadonnées associées"""
+        """
+        Ajoute un embedding à la collection avec les métadonnées associées
+        
+        L'écriture est directe (ChromaDB puis matrice en mémoire): l'embedding est
+        identifiable par toute recherche de ce processus dès le retour.
+        
+        Returns:
+            bool: True si l'embedding a été ajouté
+        """
         try:
-            # Assurez-vous que l'embedding est une liste et non un numpy array
-            if hasattr(embedding, 'tolist'):
-                embedding = embedding.tolist()
-                
-            # Vérifiez que l'embedding est bien formaté
-            logger.info(f"Ajout d'un embedding de taille {len(embedding)} pour {person_id}")
+            # Normaliser (L2) et convertir une seule fois en liste de float32
+            embedding = self._normalize(embedding).tolist()
             
-            self.collection.add(
-                ids=[person_id],
-                embeddings=[embedding],
-                metadatas=[metadata]
-            )
+            with self._write_lock:
+                self.collection.add(ids=[person_id], embeddings=[embedding], metadatas=[metadata])
+                self._mirror_add([person_id], [embedding], [metadata])
             
-            # Vérifiez que l'embedding a bien été ajouté
-            check = self.collection.get(
-                ids=[person_id],
-                include=["embeddings"]
-            )
+            # Vérification de l'écriture uniquement en mode debug
+            if logger.isEnabledFor(logging.DEBUG):
+                check = self.collection.get(ids=[person_id], include=[])
+                if not check["ids"]:
+                    logger.debug("Embedding absent après l'ajout pour %s", person_id)
             
-            if check['embeddings'][0] is None:
-                logger.error(f"L'embedding pour {person_id} a été ajouté mais est NULL")
-                return False
-                
-            logger.info(f"Embedding ajouté avec succès pour la personne {person_id}")
+            logger.debug("Embedding ajouté à ChromaDB pour %s", person_id)
             return True
         except Exception as e:
             logger.error(f"Erreur lors de l'ajout de l'embedding: {e}")
             return False
     
+    @staticmethod
+    def _normalize(embedding):
+        """Renvoie l'embedding en float32 contigu, normalisé (L2)"""
+        vector = np.array(embedding, dtype=np.float32)
+        vector /= np.linalg.norm(vector) + 1e-12
+        return vector
+    
     def search_similar(self, embedding, threshold=0.7, limit=5):
         """
         Recherche les embeddings similaires avec un seuil minimal
         """
         try:
-            # Assurez-vous que l'embedding est une liste et non un numpy array
-            if hasattr(embedding, 'tolist'):
-                embedding = embedding.tolist()
-                
-            logger.info(f"Recherche avec embedding de taille {len(embedding)}")
+            # Normaliser (L2) en float32; la liste Python n'est construite que pour Chroma
+            query = self._normalize(embedding)
             
+            logger.debug("Recherche avec embedding de taille %d", len(query))
+            
+            # Recherche exacte en mémoire pour les collections de taille raisonnable
+            if self._mirror_is_current():
+                return self._search_exact(query, threshold, limit)
+            
+            # Index HNSW de Chroma: seules les distances et métadonnées sont utiles,
+            # les embeddings (512 flottants par résultat) ne sont pas rapatriés
             results = self.collection.query(
-                query_embeddings=[embedding],
+                query_embeddings=[query.tolist()],
                 n_results=limit,
-                include=["metadatas", "distances", "embeddings"]
+                include=["metadatas", "distances"]
             )
             
             # Vérifier si des résultats ont été trouvés
             if not results['ids'][0]:
-                logger.warning("Aucun résultat trouvé")
+                logger.debug("Aucun résultat trouvé")
                 return []
             
-            # Vérifier si les embeddings existent
-            if results.get('embeddings') is None or all(e is None for e in results.get('embeddings', [[]])[0]):
-                logger.warning("Les embeddings sont NULL dans les résultats")
-                
-            # Filtrer par seuil de similarité
-            matches = []
-            for i, score in enumerate(results['distances'][0]):
-                similarity = 1 - score  # Convertir distance cosinus en similarité
-                logger.info(f"ID: {results['ids'][0][i]}, Similarité: {similarity}")
-                
-                if similarity >= threshold:
-                    matches.append({
-                        'id': results['ids'][0][i],
-                        'similarity': similarity,
-                        'metadata': results['metadatas'][0][i]
-                    })
+            # Convertir les distances (1 - produit scalaire) en similarités et filtrer par seuil (vectorisé)
+            similarities = 1.0 - np.asarray(results['distances'][0], dtype=np.float32)
+            ids = results['ids'][0]
+            metadatas = results['metadatas'][0]
+            
+            selected = np.nonzero(similarities >= threshold)[0]
+            matches = [
+                {'id': ids[i], 'similarity': similarity, 'metadata': metadatas[i]}
+                for i, similarity in zip(selected.tolist(), similarities[selected].tolist())
+            ]
             
+            logger.debug("%d/%d résultat(s) au-dessus du seuil %s", len(matches), len(ids), threshold)
             return matches
         except Exception as e:
             logger.error(f"Erreur lors de la recherche d'embeddings: {e}")
             return []
     
+    def _mirror_is_current(self):
+        """
+        Vérifie que la matrice en mémoire reflète la collection et la recharge sinon
+        (ex: embeddings ajoutés par un autre processus)
+        
+        Les écritures de ce processus mettent la matrice à jour directement; seul un
+        changement venant d'un autre processus nécessite collection.count(), interrogé
+        au plus une fois par MIRROR_CHECK_INTERVAL au lieu d'une fois par recherche.
+        Un nombre identique ne prouvant rien (suppression + ajout), les identifiants
+        sont en outre comparés au moins une fois par MIRROR_SYNC_INTERVAL.
+        
+        Returns:
+            bool: True si la recherche exacte en mémoire peut être utilisée
+        """
+        now = time.monotonic()
+        if now - self._mirror_checked_at < self.MIRROR_CHECK_INTERVAL:
+            return self._mirror_usable
+        
+        # _write_lock écarte les écritures de ce processus pendant la lecture de la
+        # collection; une vérification (ou une écriture) en cours n'est pas attendue:
+        # les autres recherches gardent l'état précédent de la matrice
+        if not self._write_lock.acquire(blocking=False):
+            return self._mirror_usable
+        try:
+            # Une autre recherche a pu faire la vérification entre-temps
+            if now - self._mirror_checked_at < self.MIRROR_CHECK_INTERVAL:
+                return self._mirror_usable
+            
+            count = self.collection.count()
+            if count > self.exact_search_max:
+                usable = False
+            else:
+                if self._matrix is None:
+                    self._load_mirror()
+                elif count != self._live_count() or now - self._mirror_synced_at >= self.MIRROR_SYNC_INTERVAL:
+                    self._sync_mirror()
+                usable = self._matrix is not None
+            
+            self._mirror_usable = usable
+            self._mirror_checked_at = time.monotonic()
+            return usable
+        finally:
+            self._write_lock.release()
+    
+    def _search_exact(self, embedding, threshold, limit):
+        """
+        Recherche par produit scalaire sur la matrice int8 en mémoire
+        
+        Les similarités sont approchées (erreur de quantification de l'ordre de 1e-3
+        pour des embeddings de dimension 512), ce qui est négligeable devant le seuil.
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        
+        with self._mirror_lock:
+            # Déquantifier par blocs pour borner la mémoire temporaire
+            similarities = np.empty(self._size, dtype=np.float32)
+            for start in range(0, self._size, self.SCORE_BLOCK):
+                end = min(start + self.SCORE_BLOCK, self._size)
+                similarities[start:end] = self._matrix[start:end].astype(np.float32) @ query
+            similarities /= self._scales[:self._size]
+            np.minimum(similarities, 1.0, out=similarities)
+            
+            similarities[~self._alive[:self._size]] = -np.inf
+            
+            k = min(limit, self._live_count())
+            if k == 0:
+                return []
+            
+            # Top-k sans tri complet, puis tri des k meilleurs
+            top = np.argpartition(-similarities, k - 1)[:k]
+            top = top[np.argsort(-similarities[top])]
+            top = top[similarities[top] >= threshold]
+            
+            # Construire les résultats à partir de noms locaux et de listes Python natives
+            ids, metadatas = self._ids, self._metadatas
+            matches = [
+                {'id': ids[i], 'similarity': similarity, 'metadata': metadatas[i]}
+                for i, similarity in zip(top.tolist(), similarities[top].tolist())
+            ]
+        
+        logger.debug("%d/%d résultat(s) au-dessus du seuil %s (recherche exacte)", len(matches), k, threshold)
+        return matches
+    
     def delete_embedding(self, person_id):
         """Supprime un embedding de la collection"""
         try:
-            self.collection.delete(ids=[person_id])
-            logger.info(f"Embedding supprimé pour la personne {person_id}")
+            with self._write_lock:
+                self.collection.delete(ids=[person_id])
+                self._mirror_delete([person_id])
+            logger.debug("Embedding supprimé pour la personne %s", person_id)
             return True
         except Exception as e:
             logger.error(f"Erreur lors de la suppression de l'embedding: {e}")
             return False
     
+    def delete_embeddings(self, ids):
+        """
+        Supprime plusieurs embeddings par lots de BATCH_SIZE identifiants
+        
+        Args:
+            ids: Identifiants des embeddings à supprimer
+            
+        Returns:
+            bool: True si la suppression a réussi
+        """
+        try:
+            for start in range(0, len(ids), self.BATCH_SIZE):
+                batch = ids[start:start + self.BATCH_SIZE]
+                with self._write_lock:
+                    self.collection.delete(ids=batch)
+                    self._mirror_delete(batch)
+            logger.debug("%d embedding(s) supprimé(s)", len(ids))
+            return True
+        except Exception as e:
+            logger.error(f"Erreur lors de la suppression groupée des embeddings: {e}")
+            return False
+    
     def update_embedding(self, person_id, embedding, metadata):
         """Met à jour un embedding existant"""
         try:
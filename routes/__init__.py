@@ -1,5 +1,3 @@
-from flask import Blueprint
-
 # Cette fonction sera appelée par app.py pour enregistrer les routes
 def init_routes(app):
     from .api import api
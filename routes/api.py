@@ -1,16 +1,227 @@
 # routes/api.py
-from flask import Blueprint, request, jsonify, current_app, send_file
+from flask import Blueprint, request, jsonify, current_app, send_file, abort, stream_with_context
 import logging
 import os
-import base64
+import io
+import re
+import threading
+import mimetypes
+from functools import lru_cache
+from cachetools import TTLCache
+from urllib.parse import quote
+from sqlalchemy.orm import undefer
 
+from models.database import db
 from models.person import Person
 from routes.dashboard import log_identification
+from utils.multipart import parse_multipart
+from utils.json_provider import dumps_bytes
 
 logger = logging.getLogger(__name__)
 
 # Créer le Blueprint
 api = Blueprint('api', __name__)
+# Références renseignées une fois les services chargés (voir app._deferred_init),
+# lues directement par les vues sans passer par le proxy current_app
+api.person_service = None
+api.face_service = None
+api.similarity_threshold = None
+
+# Types MIME des images (photos, empreintes) stockées sur disque
+_IMAGE_MIME = {
+    '.bmp': 'image/bmp',
+    '.gif': 'image/gif',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png'
+}
+
+@lru_cache(maxsize=4096)
+def _image_mime(path):
+    """Type MIME d'une image sur disque, déduit de son extension (mémorisé par chemin)"""
+    ext = os.path.splitext(path)[1].lower()
+    return _IMAGE_MIME.get(ext) or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+# Nombre décimal positif (seuil de similarité), validé sans lever d'exception
+_FLOAT_RE = re.compile(r'\d+(?:\.\d*)?|\.\d+')
+
+# Attributs (données, type MIME, chemin sur disque) de chaque type d'empreinte
+_FINGERPRINT_ATTRS = {
+    kind: (f'fingerprint_{kind}_data', f'fingerprint_{kind}_mime_type', f'fingerprint_{kind}_path')
+    for kind in ('right', 'left', 'thumbs')
+}
+
+# Attributs de la photo du visage (mêmes rôles que pour les empreintes)
+_PHOTO_ATTRS = ('photo_data', 'photo_mime_type', 'photo_path')
+
+# ETag des images stockées en base, par (personne, type): une revalidation (If-None-Match)
+# répond 304 sans charger le BLOB. L'existence de la personne est toujours vérifiée en
+# base, une suppression par un autre worker n'étant pas propagée.
+_image_etags = TTLCache(maxsize=4096, ttl=60)
+_image_etags_lock = threading.Lock()
+
+def _forget_images(person_id=None):
+    """Invalide les ETag d'images d'une personne (ou de toutes si person_id est None)"""
+    with _image_etags_lock:
+        if person_id is None:
+            _image_etags.clear()
+        else:
+            for kind in ('photo', *_FINGERPRINT_ATTRS):
+                _image_etags.pop((person_id, kind), None)
+
+def _send_image(person_id, kind, attrs, not_found_message):
+    """
+    Renvoie une image d'une personne, depuis la base ou depuis le disque
+    
+    Args:
+        person_id: ID de la personne
+        kind: Type d'image ('photo', 'right', 'left', 'thumbs')
+        attrs: Attributs (données, type MIME, chemin) de l'image sur Person
+        not_found_message: Message d'erreur si l'image n'existe pas
+    """
+    data_attr, mime_attr, path_attr = attrs
+    max_age = current_app.config['IMAGE_CACHE_MAX_AGE']
+    key = (person_id, kind)
+    
+    with _image_etags_lock:
+        etag = _image_etags.get(key)
+    
+    # Le client possède déjà la version courante: 304 sans charger le BLOB, si la personne
+    # existe encore (elle a pu être supprimée par un autre worker)
+    if etag is not None and request.if_none_match.contains(etag):
+        if db.session.query(Person.id).filter(Person.id == person_id).first() is None:
+            _forget_images(person_id)
+            abort(404, "Personne non trouvée")
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        return response
+    
+    # HEAD: en-têtes calculés en SQL (taille du BLOB comprise), sans charger le BLOB
+    if request.method == 'HEAD':
+        row = db.session.query(
+            db.func.length(getattr(Person, data_attr)), getattr(Person, mime_attr), Person.updated_at
+        ).filter(Person.id == person_id).first()
+        
+        if row is None:
+            abort(404, "Personne non trouvée")
+        
+        size, data_mime_type, updated_at = row
+        if size is not None:
+            response = current_app.response_class(mimetype=data_mime_type or 'application/octet-stream')
+            response.set_etag(f"{person_id}-{kind}-{updated_at.timestamp()}")
+            response.last_modified = updated_at
+            response.content_length = size
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+            return response
+    
+    # Charger la personne avec le seul BLOB demandé
+    person = db.session.get(Person, person_id, options=[undefer(getattr(Person, data_attr))])
+    
+    if not person:
+        abort(404, "Personne non trouvée")
+    
+    # Servir en priorité les données binaires stockées en base
+    data = getattr(person, data_attr)
+    if data is not None:
+        etag = f"{person.id}-{kind}-{person.updated_at.timestamp()}"
+        with _image_etags_lock:
+            _image_etags[key] = etag
+        return send_file(
+            io.BytesIO(data),
+            mimetype=getattr(person, mime_attr) or 'application/octet-stream',
+            etag=etag,
+            last_modified=person.updated_at,
+            conditional=True,
+            max_age=max_age
+        )
+    
+    path = getattr(person, path_attr)
+    if not path:
+        abort(404, not_found_message)
+    
+    return _send_image_file(path, max_age, not_found_message)
+
+def _send_image_file(path, max_age, not_found_message):
+    """
+    Renvoie une image stockée sur disque (ETag / Last-Modified dérivés du fichier,
+    304 si inchangée); un fichier absent est détecté par send_file lui-même
+    
+    Derrière nginx (X_ACCEL_REDIRECT_PREFIX), seul l'en-tête X-Accel-Redirect est
+    renvoyé et nginx transmet le fichier lui-même; avec USE_X_SENDFILE, send_file
+    émet l'en-tête X-Sendfile (Apache, lighttpd).
+    """
+    mime_type = _image_mime(path)
+    
+    prefix = current_app.config['X_ACCEL_REDIRECT_PREFIX']
+    if prefix:
+        relative_path = os.path.relpath(path, current_app.config['X_ACCEL_ROOT'])
+        # Les fichiers hors du dossier exposé à nginx restent servis par Flask
+        if not relative_path.startswith('..'):
+            response = current_app.response_class(mimetype=mime_type)
+            response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(relative_path.replace(os.sep, '/'))
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+            return response
+    
+    try:
+        return send_file(path, mimetype=mime_type, conditional=True, max_age=max_age)
+    except FileNotFoundError:
+        abort(404, not_found_message)
+
+@api.before_request
+def require_services():
+    """Renvoie 503 tant que les services lourds ne sont pas chargés"""
+    if not current_app.ready_event.is_set():
+        return jsonify({"error": "Service en cours de démarrage, réessayez plus tard"}), 503
+
+def _validate_person_fields(form):
+    """
+    Valide les champs texte d'une personne
+    
+    Args:
+        form: Dictionnaire des champs du formulaire
+        
+    Returns:
+        tuple: ((name, age, gender, nationality), None) ou (None, message d'erreur)
+    """
+    name = form.get('name')
+    age_str = form.get('age')
+    gender = form.get('gender')
+    nationality = form.get('nationality')
+    
+    if not all([name, age_str, gender, nationality]):
+        return None, "Tous les champs sont obligatoires"
+    
+    # isdecimal() n'accepte que les caractères que int() sait convertir
+    age_str = age_str.strip()
+    if not age_str.isdecimal():
+        return None, "L'âge doit être un nombre entier"
+    age = int(age_str)
+    if age <= 0 or age > 120:
+        return None, "L'âge doit être compris entre 1 et 120"
+    
+    return (name, age, gender, nationality), None
+
+@api.route('/persons/validate', methods=['POST'])
+def validate_person():
+    """
+    Endpoint pour valider les champs d'une personne avant d'envoyer les images
+    
+    Permet au client de détecter une erreur de saisie sans téléverser la photo et
+    les empreintes (mêmes règles et messages que POST /persons).
+    
+    Formulaire attendu: name, age, gender, nationality
+    """
+    form, _ = parse_multipart(file_fields=(), text_fields=('name', 'age', 'gender', 'nationality'))
+    
+    _, error = _validate_person_fields(form)
+    if error:
+        return jsonify({"valid": False, "error": error}), 400
+    
+    return jsonify({"valid": True}), 200
 
 @api.route('/persons', methods=['POST'])
 def create_person():
@@ -25,76 +236,97 @@ def create_person():
     - fingerprint_right: (Optionnel) Image des empreintes de la main droite
     - fingerprint_left: (Optionnel) Image des empreintes de la main gauche
     - fingerprint_thumbs: (Optionnel) Image des empreintes des pouces
+    
+    Paramètre d'URL:
+    - async: (Optionnel) Si "true", répond 202 dès l'enregistrement; l'embedding est
+      calculé en arrière-plan (suivi via /persons/<id>/status)
     """
-    try:
-        # Vérifier la présence de tous les champs requis
-        if 'photo' not in request.files:
-            return jsonify({"error": "Aucune photo fournie"}), 400
-            
-        photo = request.files['photo']
-        if photo.filename == '':
-            return jsonify({"error": "Nom de fichier vide"}), 400
-            
-        # Vérifier les champs du formulaire
-        name = request.form.get('name')
-        age_str = request.form.get('age')
-        gender = request.form.get('gender')
-        nationality = request.form.get('nationality')
-        
-        if not all([name, age_str, gender, nationality]):
-            return jsonify({"error": "Tous les champs sont obligatoires"}), 400
+    # Analyser le formulaire multipart en flux
+    form, files = parse_multipart(
+        file_fields=('photo', 'fingerprint_right', 'fingerprint_left', 'fingerprint_thumbs'),
+        text_fields=('name', 'age', 'gender', 'nationality')
+    )
+    
+    # Vérifier la présence de tous les champs requis
+    if 'photo' not in files:
+        abort(400, "Aucune photo fournie")
         
-        try:
-            age = int(age_str)
-            if age <= 0 or age > 120:
-                return jsonify({"error": "L'âge doit être compris entre 1 et 120"}), 400
-        except ValueError:
-            return jsonify({"error": "L'âge doit être un nombre entier"}), 400
+    photo = files['photo']
+    if photo.filename == '':
+        abort(400, "Nom de fichier vide")
         
-        # Récupérer les fichiers d'empreintes (optionnels)
-        fingerprint_right = request.files.get('fingerprint_right')
-        fingerprint_left = request.files.get('fingerprint_left')
-        fingerprint_thumbs = request.files.get('fingerprint_thumbs')
+    # Vérifier les champs du formulaire
+    fields, error = _validate_person_fields(form)
+    if error:
+        abort(400, error)
+    name, age, gender, nationality = fields
+    
+    # Récupérer les fichiers d'empreintes (optionnels)
+    fingerprint_right = files.get('fingerprint_right')
+    fingerprint_left = files.get('fingerprint_left')
+    fingerprint_thumbs = files.get('fingerprint_thumbs')
+    
+    # Vérifier que les empreintes ont des noms de fichiers valides
+    if fingerprint_right and fingerprint_right.filename == '':
+        fingerprint_right = None
         
-        # Vérifier que les empreintes ont des noms de fichiers valides
-        if fingerprint_right and fingerprint_right.filename == '':
-            fingerprint_right = None
-            
-        if fingerprint_left and fingerprint_left.filename == '':
-            fingerprint_left = None
-            
-        if fingerprint_thumbs and fingerprint_thumbs.filename == '':
-            fingerprint_thumbs = None
+    if fingerprint_left and fingerprint_left.filename == '':
+        fingerprint_left = None
         
-        # Créer la personne
-        person_service = current_app.person_service
-        person = person_service.create_person(
+    if fingerprint_thumbs and fingerprint_thumbs.filename == '':
+        fingerprint_thumbs = None
+    
+    person_service = api.person_service
+    
+    # Création asynchrone: réponse immédiate, embedding calculé en arrière-plan
+    if request.args.get('async', 'false').lower() in ('true', '1', 'yes'):
+        person = person_service.create_person_async(
+            current_app._get_current_object(),
             name, age, gender, nationality, photo,
             fingerprint_right, fingerprint_left, fingerprint_thumbs
         )
         
         if not person:
-            return jsonify({"error": "Impossible de créer la personne. Vérifiez que l'image contient un visage."}), 400
-            
-        # Préparer les URLs pour les empreintes
-        person_dict = person.to_dict()
-        
-        if person.fingerprint_right_path:
-            person_dict["fingerprint_right_url"] = f"/api/persons/{person.id}/fingerprint/right"
+            abort(500, "Impossible d'enregistrer la personne")
         
-        if person.fingerprint_left_path:
-            person_dict["fingerprint_left_url"] = f"/api/persons/{person.id}/fingerprint/left"
+        person_dict = person.to_dict()
+        person_dict["embedding_status"] = person.embedding_status
+        return jsonify({
+            "success": True,
+            "person": person_dict,
+            "status_url": f"/api/persons/{person.id}/status"
+        }), 202
+    
+    # Créer la personne
+    person = person_service.create_person(
+        name, age, gender, nationality, photo,
+        fingerprint_right, fingerprint_left, fingerprint_thumbs
+    )
+    
+    if not person:
+        abort(400, "Impossible de créer la personne. Vérifiez que l'image contient un visage.")
         
-        if person.fingerprint_thumbs_path:
-            person_dict["fingerprint_thumbs_url"] = f"/api/persons/{person.id}/fingerprint/thumbs"
-            
-        return jsonify({"success": True, "person": person_dict}), 201
+    # Les URLs de la photo et des empreintes sont fournies par to_dict
+    person_dict = person.to_dict()
         
-    except Exception as e:
-        logger.error(f"Erreur lors de la création de la personne: {e}")
-        return jsonify({"error": "Erreur interne du serveur"}), 500
+    return jsonify({"success": True, "person": person_dict}), 201
+
+@api.route('/persons/<uuid:person_id>/status', methods=['GET'])
+def get_person_status(person_id):
+    """
+    Endpoint pour suivre le calcul de l'embedding d'une personne créée en mode asynchrone
+    
+    Args:
+        person_id: ID de la personne
+    """
+    person = db.session.get(Person, person_id)
+    
+    if not person:
+        abort(404, "Personne non trouvée")
+    
+    return jsonify({"id": str(person.id), "embedding_status": person.embedding_status}), 200
 
-@api.route('/persons/<person_id>/fingerprint/<type>', methods=['GET'])
+@api.route('/persons/<uuid:person_id>/fingerprint/<type>', methods=['GET'])
 def get_fingerprint(person_id, type):
     """
     Endpoint pour récupérer une image d'empreinte digitale
@@ -103,123 +335,93 @@ def get_fingerprint(person_id, type):
         person_id: ID de la personne
         type: Type d'empreinte (right, left, thumbs)
     """
-    try:
-        person_service = current_app.person_service
-        person = Person.query.filter_by(id=person_id).first()
-        
-        if not person:
-            return jsonify({"error": "Personne non trouvée"}), 404
-        
-        # Déterminer le chemin selon le type
-        if type == 'right':
-            path = person.fingerprint_right_path
-        elif type == 'left':
-            path = person.fingerprint_left_path
-        elif type == 'thumbs':
-            path = person.fingerprint_thumbs_path
-        else:
-            return jsonify({"error": "Type d'empreinte invalide"}), 400
-        
-        if not path or not os.path.exists(path):
-            return jsonify({"error": "Empreinte non trouvée"}), 404
-        
-        # Déterminer le type MIME
-        file_ext = os.path.splitext(path)[1].lower()
-        mime_type = {
-            '.bmp': 'image/bmp',
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.png': 'image/png'
-        }.get(file_ext, 'application/octet-stream')
-        
-        # Renvoyer l'image
-        return send_file(path, mimetype=mime_type)
-        
-    except Exception as e:
-        logger.error(f"Erreur lors de la récupération de l'empreinte: {e}")
-        return jsonify({"error": "Erreur interne du serveur"}), 500
+    # Valider le type avant toute requête en base
+    attrs = _FINGERPRINT_ATTRS.get(type)
+    if attrs is None:
+        abort(400, "Type d'empreinte invalide")
+    
+    return _send_image(person_id, type, attrs, "Empreinte non trouvée")
 
+@api.route('/persons/<uuid:person_id>/photo', methods=['GET'])
+def get_photo(person_id):
+    """
+    Endpoint pour récupérer la photo du visage d'une personne en binaire
+    
+    Args:
+        person_id: ID de la personne
+    """
+    return _send_image(person_id, 'photo', _PHOTO_ATTRS, "Photo non trouvée")
 
 @api.route('/identify', methods=['POST'])
 def identify_person():
     """
     Endpoint pour identifier une personne à partir d'une photo
     Nécessite une image avec un visage
+    
+    Formulaire attendu:
+    - photo: Image du visage à identifier
+    - threshold: (Optionnel) Seuil de similarité entre 0 et 1
+    - include_image: (Optionnel) Si "true", inclut la photo encodée en base64 (default: "false");
+      sinon la photo est disponible via person.photo_url
     """
-    try:
-        if 'photo' not in request.files:
-            return jsonify({"error": "Aucune photo fournie"}), 400
-           
-        photo = request.files['photo']
-        if photo.filename == '':
-            return jsonify({"error": "Nom de fichier vide"}), 400
-           
-        # Récupérer threshold optionnel
-        threshold = request.form.get('threshold')
-        if threshold:
-            try:
-                threshold = float(threshold)
-                if threshold < 0 or threshold > 1:
-                    return jsonify({"error": "Le seuil doit être compris entre 0 et 1"}), 400
-            except ValueError:
-                return jsonify({"error": "Le seuil doit être un nombre entre 0 et 1"}), 400
-        else:
-            threshold = current_app.config['SIMILARITY_THRESHOLD']
-           
-        # Rechercher la personne
-        person_service = current_app.person_service
-        result = person_service.find_person_by_face(photo, threshold)
-        
-        # NOUVEAU: Enregistrer l'activité d'identification
-        if result.get("found", False) and "person" in result:
-            # Log de l'identification réussie
-            log_identification(
-                person_id=result["person"]["id"],
-                success=True,
-                details={"similarity": result.get("similarity", 0)}
-            )
-        else:
-            # Log de l'identification échouée
-            log_identification(
-                success=False,
-                details={"message": result.get("message", "Aucune correspondance trouvée")}
-            )
+    # Analyser le formulaire multipart en flux
+    form, files = parse_multipart(
+        file_fields=('photo',),
+        text_fields=('threshold', 'include_image')
+    )
+    
+    if 'photo' not in files:
+        abort(400, "Aucune photo fournie")
        
-        # Si une personne est trouvée, récupérer son image
-        if result.get("found", False) and "person" in result:
-            person_data = result["person"]
-            photo_path = person_data.get("photo_path")
-           
-            if photo_path and os.path.exists(photo_path):
-                # Déterminer le type MIME de l'image
-                file_ext = os.path.splitext(photo_path)[1].lower()
-                mime_type = {
-                    '.jpg': 'image/jpeg',
-                    '.jpeg': 'image/jpeg',
-                    '.png': 'image/png',
-                    '.gif': 'image/gif'
-                }.get(file_ext, 'application/octet-stream')
-               
-                # Lire l'image et l'encoder en base64
-                with open(photo_path, "rb") as image_file:
-                    encoded_image = base64.b64encode(image_file.read()).decode('utf-8')
-                   
-                # Ajouter l'image encodée et son type MIME au résultat
-                result["person"]["photo_data"] = encoded_image
-                result["person"]["photo_mime_type"] = mime_type
+    photo = files['photo']
+    if photo.filename == '':
+        abort(400, "Nom de fichier vide")
        
-        return jsonify(result), 200
+    # Récupérer threshold optionnel
+    threshold = form.get('threshold')
+    if threshold:
+        threshold = threshold.strip()
+        if not _FLOAT_RE.fullmatch(threshold):
+            abort(400, "Le seuil doit être un nombre entre 0 et 1")
+        threshold = float(threshold)
+        if threshold > 1:
+            abort(400, "Le seuil doit être compris entre 0 et 1")
+    else:
+        threshold = api.similarity_threshold
        
+    # La photo de la personne est accessible via photo_url; l'inclure en base64
+    # uniquement si le client le demande explicitement
+    include_image = form.get('include_image', 'false').lower() in ('true', '1', 'yes')
+    
+    # Rechercher la personne; une erreur inattendue est journalisée comme
+    # identification échouée puis confiée au gestionnaire d'erreurs de l'application
+    try:
+        person_service = api.person_service
+        result = person_service.find_person_by_face(photo, threshold, include_image_data=include_image)
     except Exception as e:
-        logger.error(f"Erreur lors de l'identification de la personne: {e}")
-        
         # NOUVEAU: Log de l'erreur d'identification
         log_identification(
             success=False,
             details={"error": str(e)}
         )
-        
-        return jsonify({"error": "Erreur interne du serveur"}), 500
+        raise
+    
+    # NOUVEAU: Enregistrer l'activité d'identification
+    if result.get("found", False) and "person" in result:
+        # Log de l'identification réussie
+        log_identification(
+            person_id=result["person"]["id"],
+            success=True,
+            details={"similarity": result.get("similarity", 0)}
+        )
+    else:
+        # Log de l'identification échouée
+        log_identification(
+            success=False,
+            details={"message": result.get("message", "Aucune correspondance trouvée")}
+        )
+    
+    return jsonify(result), 200
 
 @api.route('/persons', methods=['GET'])
 def get_all_persons():
@@ -227,138 +429,154 @@ def get_all_persons():
     Endpoint pour récupérer toutes les personnes
     
     Query parameters:
-    - include_images: Si "true", inclut les photos de visage encodées en base64 (default: "false")
-    - include_fingerprints: Si "true", inclut aussi les empreintes digitales (default: "false")
+    - include_images: Si "true", inclut les photos de visage encodées en base64 (default: "false");
+      sinon chaque personne fournit photo_url
+    - include_fingerprints: Si "true", inclut aussi les empreintes digitales (default: "false");
+      sinon chaque personne fournit fingerprint_*_url
     """
+    # Paramètres pour inclure ou non les images et empreintes
+    include_images = request.args.get('include_images', 'false').lower() in ('true', '1', 'yes')
+    include_fingerprints = request.args.get('include_fingerprints', 'false').lower() in ('true', '1', 'yes')
+    
+    # Réponse envoyée par morceaux au fil de la lecture de la table (même document
+    # {"persons": [...]} qu'avec jsonify, sans le construire entièrement en mémoire)
+    persons = api.person_service.iter_persons(
+        include_images=include_images,
+        include_fingerprints=include_fingerprints
+    )
+    return current_app.response_class(
+        stream_with_context(_stream_persons(persons)),
+        status=200,
+        mimetype='application/json'
+    )
+
+# Nombre de personnes sérialisées par morceau de la réponse GET /persons
+PERSONS_STREAM_CHUNK = 100
+
+def _stream_persons(persons):
+    """
+    Produit le document JSON {"persons": [...]} par morceaux de PERSONS_STREAM_CHUNK personnes
+    
+    Une erreur en cours de lecture est propagée: la réponse en flux est interrompue (sans
+    morceau final), le client ne reçoit pas une liste tronquée mais bien formée.
+    """
+    yield b'{"persons":['
+    chunk = []
+    separator = b''
     try:
-        # Paramètres pour inclure ou non les images et empreintes
-        include_images = request.args.get('include_images', 'false').lower() in ('true', '1', 'yes')
-        include_fingerprints = request.args.get('include_fingerprints', 'false').lower() in ('true', '1', 'yes')
-        
-        person_service = current_app.person_service
-        persons = person_service.get_all_persons(
-            include_images=include_images,
-            include_fingerprints=include_fingerprints
-        )
-        return jsonify({"persons": persons}), 200
+        for person in persons:
+            chunk.append(separator + dumps_bytes(person))
+            separator = b','
+            if len(chunk) >= PERSONS_STREAM_CHUNK:
+                yield b''.join(chunk)
+                chunk.clear()
     except Exception as e:
-        logger.error(f"Erreur lors de la récupération des personnes: {e}")
-        return jsonify({"error": "Erreur interne du serveur"}), 500
+        logger.error(f"Erreur lors de l'envoi de la liste des personnes, réponse interrompue: {e}")
+        raise
+    chunk.append(b']}')
+    yield b''.join(chunk)
 
-@api.route('/persons/<person_id>', methods=['GET'])
+@api.route('/persons/<uuid:person_id>', methods=['GET', 'HEAD'])
 def get_person(person_id):
     """
     Endpoint pour récupérer une personne par son ID
     
     Query parameters:
-    - include_images: Si "true", inclut la photo de visage encodée en base64 (default: "true")
-    - include_fingerprints: Si "true", inclut aussi les empreintes digitales (default: "false")
+    - include_images: Si "true", inclut la photo de visage encodée en base64 (default: "false");
+      sinon la photo est disponible via person.photo_url
+    - include_fingerprints: Si "true", inclut aussi les empreintes digitales (default: "false");
+      sinon elles sont disponibles via person.fingerprint_*_url
     """
-    try:
-        # Paramètres pour inclure ou non les images et empreintes
-        include_images = request.args.get('include_images', 'true').lower() in ('true', '1', 'yes')
-        include_fingerprints = request.args.get('include_fingerprints', 'false').lower() in ('true', '1', 'yes')
-        
-        person_service = current_app.person_service
-        person = person_service.get_person_by_id(
-            person_id,
-            include_images=include_images,
-            include_fingerprints=include_fingerprints
-        )
+    # HEAD: simple test d'existence, sans construire ni sérialiser la personne
+    if request.method == 'HEAD':
+        exists = db.session.query(Person.id).filter(Person.id == person_id).first() is not None
+        return current_app.response_class(status=200 if exists else 404, mimetype='application/json')
+    
+    # Paramètres pour inclure ou non les images et empreintes
+    include_images = request.args.get('include_images', 'false').lower() in ('true', '1', 'yes')
+    include_fingerprints = request.args.get('include_fingerprints', 'false').lower() in ('true', '1', 'yes')
+    
+    person_service = api.person_service
+    person = person_service.get_person_by_id(
+        person_id,
+        include_images=include_images,
+        include_fingerprints=include_fingerprints
+    )
+    
+    if not person:
+        abort(404, "Personne non trouvée")
         
-        if not person:
-            return jsonify({"error": "Personne non trouvée"}), 404
-            
-        return jsonify({"person": person}), 200
-    except Exception as e:
-        logger.error(f"Erreur lors de la récupération de la personne: {e}")
-        return jsonify({"error": "Erreur interne du serveur"}), 500
+    return jsonify({"person": person}), 200
 
 @api.route('/persons/with-fingerprints', methods=['GET'])
 def get_persons_with_fingerprints():
     """
     Endpoint pour récupérer toutes les personnes ayant des empreintes digitales
     """
-    try:
-        include_images = request.args.get('include_images', 'false').lower() in ('true', '1', 'yes')
-        include_fingerprints = request.args.get('include_fingerprints', 'false').lower() in ('true', '1', 'yes')
-        
-        person_service = current_app.person_service
-        persons = person_service.get_persons_with_fingerprints(
-            include_images=include_images,
-            include_fingerprints=include_fingerprints  # S'assurer que ce paramètre est passé
-        )
-        return jsonify({"persons": persons}), 200
-    except Exception as e:
-        logger.error(f"Erreur lors de la récupération des personnes avec empreintes: {e}")
-        return jsonify({"error": "Erreur interne du serveur"}), 500
+    include_images = request.args.get('include_images', 'false').lower() in ('true', '1', 'yes')
+    include_fingerprints = request.args.get('include_fingerprints', 'false').lower() in ('true', '1', 'yes')
+    
+    person_service = api.person_service
+    persons = person_service.get_persons_with_fingerprints(
+        include_images=include_images,
+        include_fingerprints=include_fingerprints  # S'assurer que ce paramètre est passé
+    )
+    return jsonify({"persons": persons}), 200
 
-@api.route('/persons/<person_id>', methods=['DELETE'])
+@api.route('/persons/<uuid:person_id>', methods=['DELETE'])
 def delete_person(person_id):
     """
     Endpoint pour supprimer une personne
     """
-    try:
-        person_service = current_app.person_service
-        result = person_service.delete_person(person_id)
-        
-        if not result:
-            return jsonify({"error": "Personne non trouvée ou impossible à supprimer"}), 404
-            
-        return jsonify({"success": True, "message": "Personne supprimée avec succès"}), 200
-    except Exception as e:
-        logger.error(f"Erreur lors de la suppression de la personne: {e}")
-        return jsonify({"error": "Erreur interne du serveur"}), 500
+    person_service = api.person_service
+    result = person_service.delete_person(person_id)
+    
+    if not result:
+        abort(404, "Personne non trouvée ou impossible à supprimer")
+    
+    _forget_images(person_id)
+    return jsonify({"success": True, "message": "Personne supprimée avec succès"}), 200
 
 @api.route('/process', methods=['POST'])
 def process_image():
     """
     Endpoint pour traiter une image et extraire les embeddings
     """
-    try:
-        if 'image' not in request.files:
-            return jsonify({"error": "Aucune image fournie"}), 400
-            
-        image_file = request.files['image']
-        if image_file.filename == '':
-            return jsonify({"error": "Nom de fichier vide"}), 400
-            
-        # Traiter l'image
-        face_service = current_app.face_service
-        image_bytes = image_file.read()
-        results = face_service.process_image_bytes(image_bytes)
+    # Analyser le formulaire multipart en flux
+    _, files = parse_multipart(file_fields=('image',), text_fields=())
+    
+    if 'image' not in files:
+        abort(400, "Aucune image fournie")
         
-        if "error" in results:
-            return jsonify(results), 400
-            
-        return jsonify(results), 200
+    image_file = files['image']
+    if image_file.filename == '':
+        abort(400, "Nom de fichier vide")
         
-    except Exception as e:
-        logger.error(f"Erreur lors du traitement de l'image: {e}")
-        return jsonify({"error": "Erreur interne du serveur"}), 500
+    # Traiter l'image
+    face_service = api.face_service
+    image_bytes = image_file.read()
+    results = face_service.process_image_bytes(image_bytes)
+    
+    if "error" in results:
+        return jsonify(results), 400
+        
+    return jsonify(results), 200
 
 @api.route('/admin/clear-all', methods=['POST'])
 def clear_all_data():
     """
     Supprime toutes les données des bases de données
     """
-    try:
-        # Vérifier l'authentification si nécessaire
-        
-        # 1. Récupérer toutes les personnes
-        persons = Person.query.all()
-        person_ids = [person.id for person in persons]
-        
-        # 2. Supprimer les personnes une par une pour gérer également les embeddings
-        person_service = current_app.person_service
-        for person_id in person_ids:
-            person_service.delete_person(person_id)
-        
-        return jsonify({
-            "success": True, 
-            "message": f"Toutes les données ont été supprimées ({len(person_ids)} personnes)"
-        }), 200
-        
-    except Exception as e:
-        logger.error(f"Erreur générale lors de la suppression des données: {e}")
-        return jsonify({"error": f"Erreur interne du serveur: {str(e)}"}), 500
\ No newline at end of file
+    # Vérifier l'authentification si nécessaire
+    
+    # Supprimer les personnes et leurs embeddings en une seule opération groupée
+    count = api.person_service.delete_all()
+    
+    if count is None:
+        abort(500, "Erreur lors de la suppression des données")
+    
+    _forget_images()        
+    return jsonify({
+        "success": True, 
+        "message": f"Toutes les données ont été supprimées ({count} personnes)"
+    }), 200
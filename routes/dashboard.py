@@ -3,8 +3,13 @@ from flask import Blueprint, jsonify, current_app, request
 from sqlalchemy import func, cast, Date, extract
 from datetime import datetime, timedelta
 import os
-import json
+import mmap
+import orjson
+import time
+import queue
+import atexit
 import logging
+import threading
 from models.database import db
 from models.person import Person
 
@@ -13,21 +18,45 @@ logger = logging.getLogger(__name__)
 # Créer le Blueprint
 dashboard = Blueprint('dashboard', __name__)
 
+# Journal d'identification écrit par un thread dédié: les requêtes /identify se
+# contentent de déposer l'entrée dans une file bornée (les entrées en excès sont
+# abandonnées plutôt que de bloquer les requêtes ou d'épuiser la mémoire)
+LOG_QUEUE_SIZE = 10000
+_log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+_log_writer = None
+_log_writer_lock = threading.Lock()
+_dropped_entries = 0
+# Nombre maximal d'entrées et délai maximal (secondes) regroupés en une écriture
+LOG_BATCH_SIZE = 256
+LOG_BATCH_INTERVAL = 0.1
+# Journal au format JSON Lines (une entrée par ligne, ajoutée en fin de fichier);
+# au-delà de LOG_MAX_BYTES il est renommé en .1 et un nouveau fichier est commencé
+LOG_FILE_NAME = 'identification_log.jsonl'
+LOG_MAX_BYTES = 10 * 1024 * 1024
+# Ancien journal ({"logs": [...]} réécrit à chaque entrée): plus jamais modifié, il est
+# lu en dernier recours pour conserver l'historique des installations mises à jour
+LEGACY_LOG_FILE_NAME = 'identification_log.json'
+_legacy_log_cache = (None, [])
+
+# Sections du tableau de bord et dernières statistiques calculées par combinaison de
+# sections: (expiration, statistiques), pour les rafraîchissements fréquents du tableau
+STATS_SECTIONS = ('volumetry', 'recent_activity', 'registration_evolution', 'demographics')
+_stats_cache = {}
+_stats_cache_lock = threading.Lock()
+
 # Fonction pour créer un journal d'activité (pour tracer les identifications)
 def log_identification(person_id=None, success=None, details=None):
     """
-    Enregistre une activité d'identification dans un journal JSON
+    Enregistre une activité d'identification dans un journal JSON Lines
+    
+    L'entrée est mise en file et écrite en arrière-plan, par lots.
     
     Args:
         person_id: ID de la personne identifiée (optionnel)
         success: Si l'identification a réussi
         details: Détails supplémentaires (optionnel)
     """
-    log_dir = current_app.config.get('LOG_DIR', 'logs')
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-        
-    log_file = os.path.join(log_dir, 'identification_log.json')
+    log_file = os.path.join(current_app.config.get('LOG_DIR', 'logs'), LOG_FILE_NAME)
     
     # Créer l'entrée de journal
     log_entry = {
@@ -38,62 +67,184 @@ def log_identification(person_id=None, success=None, details=None):
         'details': details
     }
     
-    # Charger le journal existant ou créer un nouveau
-    if os.path.exists(log_file):
-        try:
-            with open(log_file, 'r') as f:
-                logs = json.load(f)
-        except Exception as e:
-            logger.error(f"Erreur lors de la lecture du journal d'identification: {e}")
-            logs = {'logs': []}
-    else:
-        logs = {'logs': []}
-    
-    # Ajouter la nouvelle entrée
-    logs['logs'].append(log_entry)
+    _start_log_writer()
+    try:
+        _log_queue.put_nowait((log_file, log_entry))
+    except queue.Full:
+        global _dropped_entries
+        _dropped_entries += 1
+        if _dropped_entries % 1000 == 1:
+            logger.warning("File du journal d'identification pleine: %d entrée(s) abandonnée(s)", _dropped_entries)
+
+def flush_identification_logs():
+    """Attend que toutes les entrées en file soient écrites"""
+    if _log_writer is not None:
+        _log_queue.join()
+
+def _start_log_writer():
+    """Démarre le thread d'écriture du journal au premier appel"""
+    global _log_writer
+    if _log_writer is not None:
+        return
+    with _log_writer_lock:
+        if _log_writer is None:
+            _log_writer = threading.Thread(target=_log_writer_loop, name="identification-log", daemon=True)
+            _log_writer.start()
+            atexit.register(flush_identification_logs)
+
+def _log_writer_loop():
+    """Regroupe les entrées en file et les écrit par lots"""
+    while True:
+        batch = [_log_queue.get()]
+        deadline = time.monotonic() + LOG_BATCH_INTERVAL
+        while len(batch) < LOG_BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(_log_queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        
+        entries_by_file = {}
+        for log_file, log_entry in batch:
+            entries_by_file.setdefault(log_file, []).append(log_entry)
+        
+        for log_file, entries in entries_by_file.items():
+            _write_log_entries(log_file, entries)
+        
+        for _ in batch:
+            _log_queue.task_done()
+
+def _write_log_entries(log_file, entries):
+    """Ajoute des entrées en fin de journal (une seule écriture par lot, sans relire le fichier)"""
+    log_dir = os.path.dirname(log_file)
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
     
-    # Limiter la taille du journal (garder les 10000 dernières entrées)
-    if len(logs['logs']) > 10000:
-        logs['logs'] = logs['logs'][-10000:]
+    data = b''.join(
+        orjson.dumps(entry, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE)
+        for entry in entries
+    )
     
-    # Enregistrer le journal
     try:
-        with open(log_file, 'w') as f:
-            json.dump(logs, f)
+        with open(log_file, 'ab') as f:
+            f.write(data)
+            # Une synchronisation disque par lot, hors du chemin des requêtes
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        
+        # Limiter la taille du journal: le fichier courant remplace l'ancienne archive
+        if size > LOG_MAX_BYTES:
+            os.replace(log_file, log_file + '.1')
     except Exception as e:
         logger.error(f"Erreur lors de l'enregistrement du journal d'identification: {e}")
 
+def _read_log_tail(log_file, cutoff=None):
+    """
+    Lit un fichier du journal à rebours (mmap), des entrées les plus récentes aux plus anciennes
+    
+    Args:
+        log_file: Chemin du fichier
+        cutoff: Horodatage ISO; la lecture s'arrête à la première entrée plus ancienne
+        
+    Returns:
+        tuple: (entrées en ordre antichronologique, True si cutoff a été atteint)
+    """
+    entries = []
+    with open(log_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return entries, False
+        
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            end = len(data)
+            while end > 0:
+                start = data.rfind(b'\n', 0, end - 1) + 1
+                line = data[start:end]
+                end = start
+                
+                try:
+                    entry = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    # Ligne vide ou en cours d'écriture par un autre processus
+                    continue
+                
+                if cutoff and entry.get('timestamp', '') < cutoff:
+                    return entries, True
+                entries.append(entry)
+    
+    return entries, False
+
+def _read_legacy_log_tail(log_file, cutoff=None):
+    """
+    Lit l'ancien journal JSON, des entrées les plus récentes aux plus anciennes
+    
+    Le fichier n'est décodé qu'une fois tant que sa date de modification ne change pas.
+    
+    Args:
+        log_file: Chemin du fichier
+        cutoff: Horodatage ISO; la lecture s'arrête à la première entrée plus ancienne
+        
+    Returns:
+        list: Entrées en ordre antichronologique
+    """
+    global _legacy_log_cache
+    mtime = os.stat(log_file).st_mtime_ns
+    cached_mtime, legacy_entries = _legacy_log_cache
+    if cached_mtime != mtime:
+        with open(log_file, 'rb') as f:
+            legacy_entries = orjson.loads(f.read()).get('logs', [])
+        _legacy_log_cache = (mtime, legacy_entries)
+    
+    entries = []
+    for entry in reversed(legacy_entries):
+        if cutoff and entry.get('timestamp', '') < cutoff:
+            break
+        entries.append(entry)
+    return entries
+
 # Fonction pour lire le journal d'identification
 def get_identification_logs(days=None):
     """
     Récupère les entrées du journal d'identification
     
+    Seule la fin du journal couvrant la période demandée est décodée.
+    
     Args:
         days: Nombre de jours à considérer (optionnel)
         
     Returns:
-        list: Liste des entrées du journal
+        list: Liste des entrées du journal (ordre chronologique)
     """
     log_dir = current_app.config.get('LOG_DIR', 'logs')
-    log_file = os.path.join(log_dir, 'identification_log.json')
-    
-    if not os.path.exists(log_file):
-        return []
-    
-    try:
-        with open(log_file, 'r') as f:
-            logs = json.load(f)
-    except Exception as e:
-        logger.error(f"Erreur lors de la lecture du journal d'identification: {e}")
-        return []
+    log_file = os.path.join(log_dir, LOG_FILE_NAME)
+    cutoff = (datetime.utcnow() - timedelta(days=days)).isoformat() if days else None
     
-    entries = logs.get('logs', [])
-    
-    # Filtrer par date
-    if days:
-        cutoff_date = (datetime.utcnow() - timedelta(days=days)).isoformat()
-        entries = [entry for entry in entries if entry.get('timestamp') >= cutoff_date]
+    entries = []
+    # Fichier courant puis archive, tant que la période n'est pas couverte
+    for path in (log_file, log_file + '.1'):
+        try:
+            tail, complete = _read_log_tail(path, cutoff)
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            logger.error(f"Erreur lors de la lecture du journal d'identification: {e}")
+            break
+        
+        entries.extend(tail)
+        if complete:
+            break
+    else:
+        # Période non couverte par le journal JSON Lines: compléter avec l'ancien journal
+        try:
+            entries.extend(_read_legacy_log_tail(os.path.join(log_dir, LEGACY_LOG_FILE_NAME), cutoff))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Erreur lors de la lecture de l'ancien journal d'identification: {e}")
     
+    entries.reverse()
     return entries
 
 @dashboard.route('/stats', methods=['GET'])
@@ -113,37 +264,43 @@ def get_stats():
         requested_sections = request.args.get('sections', 'all')
         
         if requested_sections.lower() == 'all':
-            sections = ['volumetry', 'recent_activity', 'registration_evolution', 'demographics']
+            sections = STATS_SECTIONS
         else:
             sections = [s.strip() for s in requested_sections.split(',')]
         
+        # Statistiques récentes pour la même combinaison de sections
+        cache_key = frozenset(section for section in sections if section in STATS_SECTIONS)
+        cache_ttl = current_app.config['DASHBOARD_CACHE_TTL']
+        if cache_ttl > 0:
+            with _stats_cache_lock:
+                cached = _stats_cache.get(cache_key)
+            if cached is not None and cached[0] > time.monotonic():
+                return jsonify(cached[1]), 200
+        
         # Dictionnaire pour les statistiques
         stats = {}
+        # Nombre total de personnes, compté une seule fois quelle que soit la section
+        total_persons = None
         
         # 1. Volumétrie (nombre total de personnes et taille des données)
         if 'volumetry' in sections:
-            # Nombre total de personnes - TOUTES les personnes
-            total_persons = Person.query.count()
-            
-            # Taille totale des données biométriques (en MB)
-            # Calcule la somme des tailles des données binaires pour TOUTES les personnes
-            total_size_query = db.session.query(
+            # Nombre total de personnes, taille totale des données biométriques et
+            # personnes avec empreintes: une seule requête (un seul parcours de la table)
+            has_fingerprints = db.or_(
+                Person.fingerprint_right_data.isnot(None),
+                Person.fingerprint_left_data.isnot(None),
+                Person.fingerprint_thumbs_data.isnot(None)
+            )
+            total_persons, total_size, persons_with_fingerprints = db.session.query(
+                func.count(Person.id),
                 func.coalesce(func.sum(func.length(Person.photo_data)), 0) +
                 func.coalesce(func.sum(func.length(Person.fingerprint_right_data)), 0) +
                 func.coalesce(func.sum(func.length(Person.fingerprint_left_data)), 0) +
-                func.coalesce(func.sum(func.length(Person.fingerprint_thumbs_data)), 0)
-            ).scalar()
-            
-            total_size_mb = round((total_size_query or 0) / (1024 * 1024), 2)  # Convertir en MB
+                func.coalesce(func.sum(func.length(Person.fingerprint_thumbs_data)), 0),
+                func.count(Person.id).filter(has_fingerprints)
+            ).one()
             
-            # Compteur des personnes avec empreintes vs sans empreintes
-            persons_with_fingerprints = Person.query.filter(
-                db.or_(
-                    Person.fingerprint_right_data.isnot(None),
-                    Person.fingerprint_left_data.isnot(None),
-                    Person.fingerprint_thumbs_data.isnot(None)
-                )
-            ).count()
+            total_size_mb = round((total_size or 0) / (1024 * 1024), 2)  # Convertir en MB
             
             persons_without_fingerprints = total_persons - persons_with_fingerprints
             
@@ -167,18 +324,29 @@ def get_stats():
             persons_last_7d = Person.query.filter(Person.created_at >= last_week).count()
             persons_last_30d = Person.query.filter(Person.created_at >= last_month).count()
             
-            # Identifications (depuis le journal d'activité)
-            identifications_24h = get_identification_logs(1)
-            identifications_7d = get_identification_logs(7)
-            identifications_30d = get_identification_logs(30)
-            
-            successful_identifications_24h = len([i for i in identifications_24h if i.get('success')])
-            successful_identifications_7d = len([i for i in identifications_7d if i.get('success')])
-            successful_identifications_30d = len([i for i in identifications_30d if i.get('success')])
+            # Identifications (depuis le journal d'activité): une seule lecture des
+            # 30 derniers jours, chaque entrée étant comptée dans toutes ses fenêtres
+            windows = (
+                ("last_24h", yesterday.isoformat()),
+                ("last_7d", last_week.isoformat()),
+                ("last_30d", last_month.isoformat())
+            )
+            successful_identifications = {window: 0 for window, _ in windows}
+            failed_identifications = {window: 0 for window, _ in windows}
             
-            failed_identifications_24h = len([i for i in identifications_24h if i.get('success') is False])
-            failed_identifications_7d = len([i for i in identifications_7d if i.get('success') is False])
-            failed_identifications_30d = len([i for i in identifications_30d if i.get('success') is False])
+            for entry in get_identification_logs(30):
+                success = entry.get('success')
+                if success:
+                    counters = successful_identifications
+                elif success is False:
+                    counters = failed_identifications
+                else:
+                    continue
+                
+                timestamp = entry.get('timestamp', '')
+                for window, cutoff in windows:
+                    if timestamp >= cutoff:
+                        counters[window] += 1
             
             stats['recent_activity'] = {
                 "new_persons": {
@@ -186,97 +354,70 @@ def get_stats():
                     "last_7d": persons_last_7d,
                     "last_30d": persons_last_30d
                 },
-                "successful_identifications": {
-                    "last_24h": successful_identifications_24h,
-                    "last_7d": successful_identifications_7d,
-                    "last_30d": successful_identifications_30d
-                },
-                "failed_identifications": {
-                    "last_24h": failed_identifications_24h,
-                    "last_7d": failed_identifications_7d,
-                    "last_30d": failed_identifications_30d
-                }
+                "successful_identifications": successful_identifications,
+                "failed_identifications": failed_identifications
             }
         
         # 3. Évolution des inscriptions dans le temps - TOUTES les personnes
         if 'registration_evolution' in sections:
             now = datetime.utcnow()
             
+            # Intervalles [début, fin) de chaque barre de l'histogramme; toutes les
+            # barres sont comptées en une seule requête (un COUNT filtré par intervalle)
+            
             # Par jour (derniers 30 jours) - TOUTES les personnes
-            registrations_by_day = []
+            day_ranges = []
             for i in range(30, -1, -1):
                 date = now - timedelta(days=i)
-                date_str = date.strftime('%Y-%m-%d')
-                
-                # Compter les personnes créées ce jour-là
-                day_start = datetime(date.year, date.month, date.day, 0, 0, 0)
-                day_end = datetime(date.year, date.month, date.day, 23, 59, 59)
-                
-                count = Person.query.filter(
-                    Person.created_at >= day_start,
-                    Person.created_at <= day_end
-                ).count()
-                
-                registrations_by_day.append({
-                    "date": date_str,
-                    "count": count
-                })
+                day_start = datetime(date.year, date.month, date.day)
+                day_ranges.append((date.strftime('%Y-%m-%d'), day_start, day_start + timedelta(days=1)))
             
-            # Par semaine (8 dernières semaines) - TOUTES les personnes
-            registrations_by_week = []
-            for i in range(8):
+            # Par semaine (8 dernières semaines, ordre chronologique) - TOUTES les personnes
+            week_ranges = []
+            for i in range(7, -1, -1):
                 end_date = now - timedelta(weeks=i)
-                start_date = end_date - timedelta(weeks=1)
                 
                 # Obtenir le numéro de semaine ISO
-                week_num = end_date.isocalendar()[1]
-                year = end_date.isocalendar()[0]
-                
-                count = Person.query.filter(
-                    Person.created_at >= start_date,
-                    Person.created_at < end_date
-                ).count()
-                
-                registrations_by_week.append({
-                    "week": f"W{week_num} {year}",
-                    "count": count
-                })
-            
-            # Inverser pour avoir l'ordre chronologique
-            registrations_by_week.reverse()
+                year, week_num, _ = end_date.isocalendar()
+                week_ranges.append((f"W{week_num} {year}", end_date - timedelta(weeks=1), end_date))
             
-            # Par mois (12 derniers mois) - TOUTES les personnes
-            registrations_by_month = []
-            for i in range(12):
+            # Par mois (12 derniers mois, ordre chronologique) - TOUTES les personnes
+            month_ranges = []
+            for i in range(11, -1, -1):
                 end_date = now - timedelta(days=30*i)
                 
-                # Déterminer le premier et dernier jour du mois
-                year = end_date.year
-                month = end_date.month
-                
-                # Premier jour du mois
-                first_day = datetime(year, month, 1)
-                
-                # Premier jour du mois suivant
-                if month == 12:
-                    next_month = datetime(year + 1, 1, 1)
+                # Premier jour du mois et premier jour du mois suivant
+                first_day = datetime(end_date.year, end_date.month, 1)
+                if end_date.month == 12:
+                    next_month = datetime(end_date.year + 1, 1, 1)
                 else:
-                    next_month = datetime(year, month + 1, 1)
+                    next_month = datetime(end_date.year, end_date.month + 1, 1)
                 
-                count = Person.query.filter(
-                    Person.created_at >= first_day,
-                    Person.created_at < next_month
-                ).count()
-                
-                month_name = first_day.strftime('%B %Y')
-                
-                registrations_by_month.append({
-                    "month": month_name,
-                    "count": count
-                })
+                month_ranges.append((first_day.strftime('%B %Y'), first_day, next_month))
+            
+            ranges = day_ranges + week_ranges + month_ranges
+            earliest = min(start for _, start, _ in ranges)
+            counts = db.session.query(*[
+                func.count(Person.id).filter(Person.created_at >= start, Person.created_at < end)
+                for _, start, end in ranges
+            ]).filter(Person.created_at >= earliest).one()
             
-            # Inverser pour avoir l'ordre chronologique
-            registrations_by_month.reverse()
+            day_counts = counts[:len(day_ranges)]
+            week_counts = counts[len(day_ranges):len(day_ranges) + len(week_ranges)]
+            month_counts = counts[len(day_ranges) + len(week_ranges):]
+            
+            registrations_by_day = [
+                {"date": label, "count": count}
+                for (label, _, _), count in zip(day_ranges, day_counts)
+            ]
+            registrations_by_week = [
+                {"week": label, "count": count}
+                for (label, _, _), count in zip(week_ranges, week_counts)
+            ]
+            registrations_by_month = [
+                {"month": label, "count": count}
+                for (label, _, _), count in zip(month_ranges, month_counts)
+            ]
             
             stats['registration_evolution'] = {
                 "daily": registrations_by_day,
@@ -303,29 +444,40 @@ def get_stats():
                 for nationality, count in nationality_distribution
             ]
             
-            # Distribution par âge - TOUTES les personnes
-            age_groups = {
-                "0-18": Person.query.filter(Person.age <= 18).count(),
-                "19-30": Person.query.filter(Person.age > 18, Person.age <= 30).count(),
-                "31-45": Person.query.filter(Person.age > 30, Person.age <= 45).count(),
-                "46-60": Person.query.filter(Person.age > 45, Person.age <= 60).count(),
-                "60+": Person.query.filter(Person.age > 60).count()
+            # Distribution par âge - TOUTES les personnes (une seule requête)
+            age_conditions = {
+                "0-18": Person.age <= 18,
+                "19-30": db.and_(Person.age > 18, Person.age <= 30),
+                "31-45": db.and_(Person.age > 30, Person.age <= 45),
+                "46-60": db.and_(Person.age > 45, Person.age <= 60),
+                "60+": Person.age > 60
             }
+            total_count, *age_counts = db.session.query(
+                func.count(Person.id),
+                *[func.count(Person.id).filter(condition) for condition in age_conditions.values()]
+            ).one()
+            age_groups = dict(zip(age_conditions, age_counts))
+            if total_persons is None:
+                total_persons = total_count
             
             stats['demographics'] = {
                 "gender_distribution": gender_stats,
                 "top_nationalities": top_nationalities,
                 "age_groups": age_groups,
-                "total_count": Person.query.count()  # Nombre total pour vérification
+                "total_count": total_persons  # Nombre total pour vérification
             }
         
         # Informations sur les sections disponibles
-        stats['available_sections'] = [
-            'volumetry', 'recent_activity', 'registration_evolution', 'demographics'
-        ]
+        stats['available_sections'] = list(STATS_SECTIONS)
         
         # Vérification générale - confirmer que toutes les personnes sont comptées
-        stats['total_persons_in_database'] = Person.query.count()
+        if total_persons is None:
+            total_persons = Person.query.count()
+        stats['total_persons_in_database'] = total_persons
+        
+        if cache_ttl > 0:
+            with _stats_cache_lock:
+                _stats_cache[cache_key] = (time.monotonic() + cache_ttl, stats)
         
         return jsonify(stats), 200
         
@@ -1,6 +1,11 @@
 import logging
+import hashlib
+import threading
 import numpy as np
+import onnxruntime
+from cachetools import LRUCache
 from insightface.app import FaceAnalysis
+from insightface.app.common import Face
 import cv2
 import os
 
@@ -9,64 +14,202 @@ logger = logging.getLogger(__name__)
 class FaceService:
     """Service pour la détection et l'extraction d'embeddings de visages"""
     
-    def __init__(self, model_name="buffalo_l"):
-        """Initialise le modèle InsightFace"""
+    # Options des fournisseurs d'exécution ONNX Runtime: FP16 pour TensorRT,
+    # recherche exhaustive de l'algorithme de convolution le plus rapide pour CUDA
+    PROVIDER_OPTIONS = {
+        'TensorrtExecutionProvider': {'trt_fp16_enable': True},
+        'CUDAExecutionProvider': {'cudnn_conv_algo_search': 'EXHAUSTIVE'}
+    }
+    
+    def __init__(self, model_name="buffalo_l", cache_size=1024, providers=None, inference_concurrency=1,
+                 det_size=640, fast_det_size=320):
+        """
+        Initialise le modèle InsightFace
+        
+        Args:
+            model_name: Nom du modèle InsightFace
+            cache_size: Nombre d'embeddings conservés dans le cache (clé: hash du contenu de l'image)
+            providers: Fournisseurs d'exécution ONNX Runtime par ordre de préférence
+                       (ex: ['CUDAExecutionProvider', 'CPUExecutionProvider']); ceux qui ne
+                       sont pas disponibles sur la machine sont ignorés
+            inference_concurrency: Nombre maximal d'inférences simultanées; ONNX Runtime
+                                   parallélise déjà une inférence sur tous les cœurs
+            det_size: Résolution de détection pour l'enregistrement (meilleur rappel)
+            fast_det_size: Résolution de détection pour l'identification et /process;
+                           le coût de la détection croît avec la surface de l'image
+        """
+        # Cache des embeddings par contenu d'image, partagé entre les requêtes
+        self._embedding_cache = LRUCache(maxsize=cache_size)
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
+        # Les threads de requête attendent leur tour ici plutôt que de se disputer
+        # les cœurs du pool de threads d'ONNX Runtime
+        self._inference_slots = threading.BoundedSemaphore(inference_concurrency)
+        
+        self.det_size = (det_size, det_size)
+        self.fast_det_size = (fast_det_size, fast_det_size)
+        
+        available = set(onnxruntime.get_available_providers())
+        providers = [p for p in (providers or ['CPUExecutionProvider']) if p in available]
+        if 'CPUExecutionProvider' not in providers:
+            providers.append('CPUExecutionProvider')
+        
         try:
             self.face_app = FaceAnalysis(
                 name=model_name,
                 allowed_modules=["detection", "recognition"],
-                providers=['CPUExecutionProvider']
+                providers=providers,
+                provider_options=[self.PROVIDER_OPTIONS.get(p, {}) for p in providers]
             )
-            self.face_app.prepare(ctx_id=-1, det_size=(640, 640))
-            logger.info(f"Modèle InsightFace '{model_name}' initialisé avec succès")
+            # ctx_id=-1 force le CPU; 0 désigne le premier GPU
+            ctx_id = -1 if providers == ['CPUExecutionProvider'] else 0
+            self.face_app.prepare(ctx_id=ctx_id, det_size=self.det_size)
+            logger.info(f"Modèle InsightFace '{model_name}' initialisé avec succès ({', '.join(providers)})")
         except Exception as e:
             logger.error(f"Erreur d'initialisation d'InsightFace: {e}")
             raise
+        
+        self._warm_up()
+    
+    def _warm_up(self):
+        """
+        Exécute une première inférence de chaque modèle au démarrage
+        
+        La première exécution d'une session ONNX (allocation des tampons, choix des
+        noyaux cuDNN/MKL) est bien plus lente que les suivantes: elle est payée ici
+        plutôt que par la première requête.
+        """
+        try:
+            # Détection aux deux résolutions utilisées (l'image vide ne contient aucun visage)
+            for size in {self.det_size, self.fast_det_size}:
+                blank = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+                self.face_app.det_model.detect(blank, input_size=size, max_num=0, metric='default')
+            
+            # Reconnaissance sur une image alignée factice (112x112)
+            recognition = self.face_app.models.get('recognition')
+            if recognition is not None:
+                recognition.get_feat(np.zeros((112, 112, 3), dtype=np.uint8))
+        except Exception as e:
+            logger.warning(f"Préchauffage d'InsightFace impossible: {e}")
+    
+    def _detect_faces(self, image_bytes, input_size):
+        """
+        Détecte les visages d'une image et calcule leurs embeddings normalisés
+        
+        Le résultat est mis en cache, indexé par le hash BLAKE2b du contenu et la résolution:
+        une image déjà analysée (nouvel essai, /process puis /identify) n'est pas repassée
+        dans le modèle.
+        
+        Args:
+            image_bytes: Bytes de l'image
+            input_size: Résolution de détection
+            
+        Returns:
+            tuple: (embedding, bbox, score) pour chaque visage (embedding: np.ndarray
+                   float32 normalisé), ou None si l'image ne peut pas être décodée
+        """
+        key = (hashlib.blake2b(image_bytes, digest_size=16).digest(), input_size)
+        with self._cache_lock:
+            cached = self._embedding_cache.get(key)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached
+            self.cache_misses += 1
+        
+        # Décoder l'image
+        img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            return None
+        
+        # Conversion en RGB (InsightFace attend RGB)
+        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        
+        # Détecter les visages
+        with self._inference_slots:
+            faces = self._analyze(img_rgb, input_size)
+        
+        result = []
+        for face in faces:
+            # Normaliser l'embedding (float32, en place) pour la recherche par similarité
+            # cosinus; il reste un tableau NumPy, sérialisé directement par orjson
+            embedding = face.embedding.astype(np.float32)
+            embedding /= max(np.linalg.norm(embedding), 1e-12)
+            # Partagé entre les requêtes via le cache: en lecture seule
+            embedding.flags.writeable = False
+            result.append((embedding, face.bbox.tolist(), face.det_score.item()))
+        result = tuple(result)
+        
+        with self._cache_lock:
+            self._embedding_cache[key] = result
+        
+        return result
     
-    def extract_embedding(self, image_path):
+    def _analyze(self, img, input_size):
         """
-        Extrait l'embedding d'un visage à partir d'une image
+        Équivalent de FaceAnalysis.get avec une résolution de détection choisie par appel
         
         Args:
-            image_path: Chemin vers l'image à analyser
+            img: Image décodée
+            input_size: Résolution de détection
+            
+        Returns:
+            list: Visages détectés (objets Face avec embedding)
+        """
+        bboxes, kpss = self.face_app.det_model.detect(img, input_size=input_size, max_num=0, metric='default')
+        
+        faces = []
+        for i in range(bboxes.shape[0]):
+            face = Face(bbox=bboxes[i, 0:4], kps=kpss[i] if kpss is not None else None, det_score=bboxes[i, 4])
+            for taskname, model in self.face_app.models.items():
+                if taskname != 'detection':
+                    model.get(img, face)
+            faces.append(face)
+        return faces
+    
+    def extract_embedding_from_bytes(self, image_bytes, fast=False):
+        """
+        Extrait l'embedding d'un visage à partir du contenu d'une image
+        
+        Args:
+            image_bytes: Bytes de l'image
+            fast: Si True, détection à la résolution réduite (fast_det_size)
             
         Returns:
             tuple: (embedding, bbox, score) ou (None, None, None) si aucun visage trouvé
+            
+        L'embedding est normalisé (L2): VectorStore compare les embeddings par
+        produit scalaire, qui n'équivaut à la similarité cosinus que sur des
+        vecteurs unitaires.
         """
         try:
-            # Charger l'image
-            img = cv2.imread(image_path)
-            if img is None:
-                logger.error(f"Impossible de charger l'image: {image_path}")
+            faces = self._detect_faces(image_bytes, self.fast_det_size if fast else self.det_size)
+            if faces is None:
+                logger.error("Impossible de décoder l'image")
                 return None, None, None
             
-            # Conversion en RGB (InsightFace attend RGB)
-            img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            
-            # Détecter les visages
-            faces = self.face_app.get(img_rgb)
-            
             if not faces:
-                logger.warning(f"Aucun visage détecté dans l'image: {image_path}")
+                logger.warning("Aucun visage détecté dans l'image")
                 return None, None, None
             
             # Prendre le visage avec le score de détection le plus élevé
-            best_face = max(faces, key=lambda x: x.det_score)
-            
-            # Normaliser l'embedding pour la recherche par similarité cosinus
-            embedding = best_face.embedding
-            norm = np.linalg.norm(embedding)
-            if norm > 0:
-                normalized_embedding = embedding / norm
-            else:
-                normalized_embedding = embedding
-            
-            return normalized_embedding.tolist(), best_face.bbox.tolist(), best_face.det_score.item()
+            return max(faces, key=lambda face: face[2])
             
         except Exception as e:
             logger.error(f"Erreur lors de l'extraction de l'embedding: {e}")
             return None, None, None
     
+    def cache_stats(self):
+        """Renvoie les statistiques du cache d'embeddings"""
+        with self._cache_lock:
+            return {
+                "size": len(self._embedding_cache),
+                "max_size": self._embedding_cache.maxsize,
+                "hits": self.cache_hits,
+                "misses": self.cache_misses
+            }
+    
     def process_image_bytes(self, image_bytes):
         """
         Traite une image depuis des bytes (pour les requêtes HTTP)
@@ -78,38 +221,24 @@ class FaceService:
             dict: Résultats de la détection de visages
         """
         try:
-            # Convertir les bytes en image OpenCV
-            nparr = np.frombuffer(image_bytes, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            # Détection des visages (partagée avec extract_embedding_from_bytes via le cache)
+            faces = self._detect_faces(image_bytes, self.fast_det_size)
             
-            if img is None:
+            if faces is None:
                 return {"error": "Format d'image non supporté"}
-                
-            # Conversion RGB
-            img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            
-            # Détection des visages
-            faces = self.face_app.get(img_rgb)
             
             if not faces:
                 return {"message": "Aucun visage détecté"}
                 
-            results = []
-            for i, face in enumerate(faces):
-                embedding = face.embedding.tolist()
-                norm = np.linalg.norm(face.embedding)
-                
-                if norm > 0:
-                    normalized_embedding = (face.embedding / norm).tolist()
-                else:
-                    normalized_embedding = embedding
-                    
-                results.append({
-                    "face_index": i+1,
-                    "embedding": normalized_embedding,
-                    "bbox": face.bbox.tolist(),
-                    "detection_score": face.det_score.item()
-                })
+            results = [
+                {
+                    "face_index": i + 1,
+                    "embedding": embedding,
+                    "bbox": bbox,
+                    "detection_score": score
+                }
+                for i, (embedding, bbox, score) in enumerate(faces)
+            ]
                 
             return {"faces": results}
             
@@ -1,21 +1,61 @@
 # services/person_service.py
 import logging
 import os
+import time
 import uuid
-import base64
-from datetime import datetime
+from datetime import timedelta
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import undefer
 import mimetypes
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from models.database import db
-from models.person import Person
+from models.person import Person, UTC_NOW
 
 logger = logging.getLogger(__name__)
 
+# Types MIME des images téléversées, par extension (mimetypes n'est consulté que pour
+# les autres extensions)
+_UPLOAD_MIME = {
+    '.bmp': 'image/bmp',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.webp': 'image/webp'
+}
+
+def _upload_mime(filename):
+    """Type MIME d'un fichier téléversé, déduit de l'extension de son nom"""
+    ext = os.path.splitext(filename or '')[1].lower()
+    return _UPLOAD_MIME.get(ext) or mimetypes.guess_type(filename or '')[0] or 'application/octet-stream'
+
+def _safe_unlink(path):
+    """
+    Supprime un fichier sans vérification préalable de son existence
+    
+    Returns:
+        bool: True si le fichier a été supprimé
+    """
+    try:
+        os.unlink(path)
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        logger.error(f"Impossible de supprimer le fichier {path}: {e}")
+        return False
+
 class PersonService:
     """Service pour la gestion des personnes"""
     
-    def __init__(self, vector_store, face_service, upload_folder, fingerprints_folder):
+    # Âge (en secondes) au-delà duquel un fichier temporaire est considéré comme abandonné
+    TEMP_FILE_MAX_AGE = 3600
+    # Délai (en secondes) sans progression au-delà duquel une création asynchrone encore
+    # 'pending' est considérée comme abandonnée (worker redémarré) et reprise
+    PENDING_RESUME_AFTER = 60
+    
+    def __init__(self, vector_store, face_service, upload_folder, fingerprints_folder, result_cache=None, embedding_workers=2):
         """
         Initialise le service
         
@@ -24,12 +64,45 @@ class PersonService:
             face_service: Instance de FaceService pour l'extraction d'embeddings
             upload_folder: Dossier pour stocker les photos de visage
             fingerprints_folder: Dossier pour stocker les images d'empreintes
+            result_cache: Instance de SimilarityCache pour les résultats d'identification (optionnel)
+            embedding_workers: Nombre de threads calculant les embeddings des créations asynchrones
         """
         self.vector_store = vector_store
         self.face_service = face_service
         self.upload_folder = upload_folder
         self.fingerprints_folder = fingerprints_folder
+        self.result_cache = result_cache
+        self.executor = ThreadPoolExecutor(max_workers=embedding_workers, thread_name_prefix="embedding")
         
+    def purge_temp_files(self):
+        """
+        Supprime les fichiers temporaires abandonnés dans le dossier de téléchargement
+        (images à analyser écrites sur disque par les versions précédentes du service,
+        non supprimées suite à un arrêt pendant une requête)
+        
+        Seuls les fichiers de plus de TEMP_FILE_MAX_AGE secondes sont supprimés, pour ne
+        pas toucher aux requêtes en cours dans les autres workers.
+        
+        Returns:
+            int: Nombre de fichiers supprimés
+        """
+        cutoff = time.time() - self.TEMP_FILE_MAX_AGE
+        try:
+            with os.scandir(self.upload_folder) as entries:
+                paths = [
+                    entry.path for entry in entries
+                    if entry.name.startswith('temp_') and entry.is_file() and entry.stat().st_mtime < cutoff
+                ]
+        except OSError as e:
+            logger.error(f"Erreur lors du nettoyage des fichiers temporaires: {e}")
+            return 0
+        
+        # unlink libère le GIL: les suppressions se font en parallèle
+        removed = sum(self.executor.map(_safe_unlink, paths))
+        if removed:
+            logger.info(f"{removed} fichier(s) temporaire(s) abandonné(s) supprimé(s)")
+        return removed
+    
     def create_person(self, name, age, gender, nationality, image_file, fingerprint_right=None, fingerprint_left=None, fingerprint_thumbs=None):
         """
         Crée une nouvelle personne avec son embedding facial et ses empreintes
@@ -49,20 +122,17 @@ class PersonService:
         """
         try:
             # Générer un identifiant unique pour la personne
-            person_id = str(uuid.uuid4())
+            person_id = uuid.uuid4()
             
-            # Sauvegarder temporairement l'image du visage pour extraction d'embedding
-            temp_filename = f"temp_{uuid.uuid4()}_{image_file.filename}"
-            temp_path = os.path.join(self.upload_folder, temp_filename)
-            image_file.save(temp_path)
+            # Lire la photo une seule fois: elle sert à l'extraction de l'embedding
+            # (sans fichier temporaire) puis est stockée en base de données
+            photo_data, photo_mime_type = self._read_upload(image_file)
             
             # Extraire l'embedding du visage
-            embedding, bbox, score = self.face_service.extract_embedding(temp_path)
+            embedding, bbox, score = self.face_service.extract_embedding_from_bytes(photo_data)
             
             if embedding is None:
                 logger.error(f"Impossible d'extraire l'embedding du visage pour {name}")
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
                 return None
             
             # Métadonnées pour ChromaDB
@@ -71,45 +141,13 @@ class PersonService:
                 "age": age,
                 "gender": gender,
                 "nationality": nationality,
-                "person_id": person_id
+                "person_id": str(person_id)
             }
             
-            # Ajouter l'embedding à ChromaDB
-            if not self.vector_store.add_embedding(person_id, embedding, metadata):
-                logger.error(f"Erreur lors de l'ajout de l'embedding pour {name}")
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-                return None
-            
-            # Lire les fichiers en binaire pour les stocker en base de données
-            photo_data = None
-            photo_mime_type = None
-            if image_file:
-                # Reset file pointer to beginning
-                image_file.seek(0)
-                photo_data = image_file.read()
-                photo_mime_type = mimetypes.guess_type(image_file.filename)[0] or 'application/octet-stream'
-            
-            fingerprint_right_data = None
-            fingerprint_right_mime_type = None
-            if fingerprint_right:
-                fingerprint_right.seek(0)
-                fingerprint_right_data = fingerprint_right.read()
-                fingerprint_right_mime_type = mimetypes.guess_type(fingerprint_right.filename)[0] or 'application/octet-stream'
-            
-            fingerprint_left_data = None
-            fingerprint_left_mime_type = None
-            if fingerprint_left:
-                fingerprint_left.seek(0)
-                fingerprint_left_data = fingerprint_left.read()
-                fingerprint_left_mime_type = mimetypes.guess_type(fingerprint_left.filename)[0] or 'application/octet-stream'
-            
-            fingerprint_thumbs_data = None
-            fingerprint_thumbs_mime_type = None
-            if fingerprint_thumbs:
-                fingerprint_thumbs.seek(0)
-                fingerprint_thumbs_data = fingerprint_thumbs.read()
-                fingerprint_thumbs_mime_type = mimetypes.guess_type(fingerprint_thumbs.filename)[0] or 'application/octet-stream'
+            # Lire les empreintes en binaire pour les stocker en base de données
+            fingerprint_right_data, fingerprint_right_mime_type = self._read_upload(fingerprint_right)
+            fingerprint_left_data, fingerprint_left_mime_type = self._read_upload(fingerprint_left)
+            fingerprint_thumbs_data, fingerprint_thumbs_mime_type = self._read_upload(fingerprint_thumbs)
             
             # Créer la personne dans la base de données
             person = Person(
@@ -131,12 +169,26 @@ class PersonService:
                 fingerprint_thumbs_mime_type=fingerprint_thumbs_mime_type
             )
             
+            # Insérer la ligne (sans valider la transaction) avant d'écrire dans ChromaDB:
+            # une erreur SQL n'y laisse alors aucun embedding orphelin
             db.session.add(person)
-            db.session.commit()
+            db.session.flush()
+            
+            # Ajouter l'embedding à ChromaDB (les identifiants Chroma sont des chaînes):
+            # la personne n'est validée qu'une fois identifiable
+            vector_id = str(person_id)
+            if not self.vector_store.add_embedding(vector_id, embedding, metadata):
+                db.session.rollback()
+                logger.error(f"Erreur lors de l'ajout de l'embedding pour {name}")
+                return None
             
-            # Supprimer l'image temporaire
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+            try:
+                db.session.commit()
+            except Exception:
+                # Compenser l'écriture dans ChromaDB si la validation échoue
+                self.vector_store.delete_embedding(vector_id)
+                raise
+            self._invalidate_results()
                 
             logger.info(f"Personne créée avec succès: {name} (ID: {person_id})")
             return person
@@ -144,107 +196,346 @@ class PersonService:
         except SQLAlchemyError as e:
             db.session.rollback()
             logger.error(f"Erreur de base de données lors de la création de la personne: {e}")
-            # Nettoyage en cas d'erreur
-            if 'temp_path' in locals() and os.path.exists(temp_path):
-                os.remove(temp_path)
             return None
         except Exception as e:
             db.session.rollback()
             logger.error(f"Erreur lors de la création de la personne: {e}")
-            # Nettoyage en cas d'erreur
-            if 'temp_path' in locals() and os.path.exists(temp_path):
-                os.remove(temp_path)
             return None
             
-    def find_person_by_face(self, image_file, threshold=0.7):
+    @staticmethod
+    def _read_upload(file):
         """
-        Recherche une personne en utilisant la reconnaissance faciale
+        Lit le contenu d'un fichier téléversé
+        
+        Returns:
+            tuple: (bytes, type MIME) ou (None, None) si aucun fichier
+        """
+        if not file:
+            return None, None
+        file.seek(0)
+        return file.read(), _upload_mime(file.filename)
+    
+    def create_person_async(self, app, name, age, gender, nationality, image_file, fingerprint_right=None, fingerprint_left=None, fingerprint_thumbs=None):
+        """
+        Enregistre une personne immédiatement et calcule son embedding en arrière-plan
+        
+        La personne est créée avec embedding_status='pending' et n'est identifiable
+        qu'une fois l'embedding ajouté à ChromaDB (embedding_status='ready').
         
         Args:
+            app: Application Flask (le calcul s'exécute dans son contexte)
+            name, age, gender, nationality: Informations de la personne
             image_file: Fichier image contenant un visage
-            threshold: Seuil de similarité (0-1)
+            fingerprint_right, fingerprint_left, fingerprint_thumbs: Fichiers d'empreintes (optionnels)
             
         Returns:
-            dict: Résultat de la recherche ou None
+            Person ou None en cas d'erreur
         """
         try:
-            # Sauvegarder temporairement l'image
-            temp_filename = f"temp_{uuid.uuid4()}_{image_file.filename}"
-            temp_path = os.path.join(self.upload_folder, temp_filename)
-            image_file.save(temp_path)
+            person_id = uuid.uuid4()
             
-            # Extraire l'embedding
-            embedding, bbox, score = self.face_service.extract_embedding(temp_path)
+            photo_data, photo_mime_type = self._read_upload(image_file)
+            fingerprint_right_data, fingerprint_right_mime_type = self._read_upload(fingerprint_right)
+            fingerprint_left_data, fingerprint_left_mime_type = self._read_upload(fingerprint_left)
+            fingerprint_thumbs_data, fingerprint_thumbs_mime_type = self._read_upload(fingerprint_thumbs)
             
-            # Nettoyer le fichier temporaire
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+            person = Person(
+                id=person_id,
+                name=name,
+                age=age,
+                gender=gender,
+                nationality=nationality,
+                vector_id=person_id,
+                embedding_status='pending',
+                photo_data=photo_data,
+                photo_mime_type=photo_mime_type,
+                fingerprint_right_data=fingerprint_right_data,
+                fingerprint_right_mime_type=fingerprint_right_mime_type,
+                fingerprint_left_data=fingerprint_left_data,
+                fingerprint_left_mime_type=fingerprint_left_mime_type,
+                fingerprint_thumbs_data=fingerprint_thumbs_data,
+                fingerprint_thumbs_mime_type=fingerprint_thumbs_mime_type
+            )
             
-            if embedding is None:
-                return {"found": False, "message": "Aucun visage détecté dans l'image"}
+            db.session.add(person)
+            db.session.commit()
             
-            # Rechercher des visages similaires
-            matches = self.vector_store.search_similar(embedding, threshold)
+            metadata = {
+                "name": name,
+                "age": age,
+                "gender": gender,
+                "nationality": nationality,
+                "person_id": str(person_id)
+            }
+            self.executor.submit(self._process_embedding, app, person_id, photo_data, metadata)
             
-            if not matches:
-                return {"found": False, "message": "Aucune correspondance trouvée"}
+            logger.info(f"Personne enregistrée, embedding en attente: {name} (ID: {person_id})")
+            return person
             
-            # Essayer plusieurs approches pour trouver la personne correspondante
-            for match in matches:
-                # Approche 1: Essayer avec l'ID direct de ChromaDB
-                direct_id = match["id"]
-                person = Person.query.filter_by(id=direct_id).first()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error(f"Erreur de base de données lors de la création de la personne: {e}")
+            return None
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Erreur lors de la création de la personne: {e}")
+            return None
+    
+    def _process_embedding(self, app, person_id, photo_data, metadata):
+        """Calcule et enregistre l'embedding d'une personne créée en mode asynchrone"""
+        with app.app_context():
+            try:
+                embedding, bbox, score = self.face_service.extract_embedding_from_bytes(photo_data)
                 
-                if person:
-                    # Inclure les données d'image directement
-                    return {
-                        "found": True,
-                        "person": person.to_dict(include_image_data=True),
-                        "similarity": match["similarity"]
-                    }
+                status = 'failed'
+                if embedding is None:
+                    logger.error(f"Impossible d'extraire l'embedding du visage pour {person_id}")
+                elif self.vector_store.add_embedding(str(person_id), embedding, metadata):
+                    status = 'ready'
+                else:
+                    logger.error(f"Erreur lors de l'ajout de l'embedding pour {person_id}")
                 
-                # Approche 2: Essayer avec le vector_id
-                person = Person.query.filter_by(vector_id=direct_id).first()
+                Person.query.filter_by(id=person_id).update({"embedding_status": status})
+                db.session.commit()
+                if status == 'ready':
+                    self._invalidate_results()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Erreur lors du calcul de l'embedding de la personne {person_id}: {e}")
+    
+    def resume_pending_embeddings(self, app, reschedule=True):
+        """
+        Reprend les créations asynchrones restées 'pending' après l'arrêt du worker qui les traitait
+        
+        Chaque personne est réservée par une mise à jour conditionnelle de updated_at: un seul
+        worker la reprend, même si plusieurs démarrent en même temps. Les créations plus récentes
+        que PENDING_RESUME_AFTER peuvent être en cours dans un autre worker: elles sont laissées
+        de côté et un second passage est programmé après ce délai.
+        
+        Args:
+            app: Application Flask (le calcul s'exécute dans son contexte)
+            reschedule: Si True, programme un second passage après PENDING_RESUME_AFTER secondes
+            
+        Returns:
+            int: Nombre de créations reprises
+        """
+        resumed = 0
+        with app.app_context():
+            try:
+                # Seuil calculé par la base, avec la même horloge que updated_at (UTC_NOW):
+                # un décalage d'horloge avec l'hôte de l'application est sans effet
+                cutoff = db.func.timezone('utc', db.func.now(), type_=db.DateTime) - timedelta(seconds=self.PENDING_RESUME_AFTER)
+                stale = db.session.query(Person.id, Person.updated_at).filter(
+                    Person.embedding_status == 'pending',
+                    Person.updated_at < cutoff
+                ).all()
                 
-                if person:
-                    # Inclure les données d'image directement
-                    return {
-                        "found": True,
-                        "person": person.to_dict(include_image_data=True),
-                        "similarity": match["similarity"]
+                for person_id, updated_at in stale:
+                    claimed = Person.query.filter(
+                        Person.id == person_id,
+                        Person.embedding_status == 'pending',
+                        Person.updated_at == updated_at
+                    ).update({"updated_at": UTC_NOW}, synchronize_session=False)
+                    db.session.commit()
+                    if not claimed:
+                        continue
+                    
+                    person = db.session.get(Person, person_id, options=[undefer(Person.photo_data)])
+                    if person is None:
+                        continue
+                    metadata = {
+                        "name": person.name,
+                        "age": person.age,
+                        "gender": person.gender,
+                        "nationality": person.nationality,
+                        "person_id": str(person_id)
                     }
+                    self.executor.submit(self._process_embedding, app, person_id, person.photo_data, metadata)
+                    resumed += 1
                 
-                # Approche 3: Essayer avec person_id dans les métadonnées
-                if "metadata" in match and "person_id" in match["metadata"]:
-                    metadata_person_id = match["metadata"]["person_id"]
-                    person = Person.query.filter_by(id=metadata_person_id).first()
-                    
-                    if person:
-                        # Inclure les données d'image directement
-                        return {
-                            "found": True,
-                            "person": person.to_dict(include_image_data=True),
-                            "similarity": match["similarity"]
-                        }
+                if resumed:
+                    logger.info(f"{resumed} création(s) asynchrone(s) en attente reprise(s)")
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Erreur lors de la reprise des créations asynchrones en attente: {e}")
+        
+        if reschedule:
+            timer = threading.Timer(self.PENDING_RESUME_AFTER, self.resume_pending_embeddings, args=(app, False))
+            timer.daemon = True
+            timer.start()
+        return resumed
+    
+    def find_person_by_face(self, image_file, threshold=0.7, include_image_data=False, top_k=5):
+        """
+        Recherche une personne en utilisant la reconnaissance faciale
+        
+        Args:
+            image_file: Fichier image contenant un visage
+            threshold: Seuil de similarité (0-1)
+            include_image_data: Si True, inclut la photo encodée en base64 dans le résultat
+            top_k: Nombre de candidats demandés à l'index vectoriel
+            
+        Returns:
+            dict: Résultat de la recherche ou None
+        """
+        try:
+            # Extraire l'embedding directement depuis le contenu téléversé (sans fichier
+            # temporaire; une image déjà analysée est servie par le cache de FaceService)
+            image_bytes, _ = self._read_upload(image_file)
+            embedding, bbox, score = self.face_service.extract_embedding_from_bytes(image_bytes, fast=True)
+            
+            if embedding is None:
+                return {"found": False, "message": "Aucun visage détecté dans l'image"}
+            
+            # Réutiliser le résultat d'une requête récente sur un visage quasi identique
+            cache_key = (threshold, include_image_data, top_k)
+            if self.result_cache is not None:
+                result = self.result_cache.get(embedding, cache_key)
+                if result is not None:
+                    return result
             
-            # Si aucune approche n'a fonctionné
-            logger.warning(f"Aucune personne trouvée dans la base de données malgré {len(matches)} correspondances dans ChromaDB")
+            result = self._match_embedding(embedding, threshold, include_image_data, top_k)
             
-            return {"found": False, "message": "Personne non trouvée dans la base de données"}
+            if self.result_cache is not None:
+                self.result_cache.put(embedding, cache_key, result)
+            return result
             
         except SQLAlchemyError as e:
             logger.error(f"Erreur de base de données lors de la recherche de la personne: {e}")
-            # Nettoyer le fichier temporaire en cas d'erreur
-            if 'temp_path' in locals() and os.path.exists(temp_path):
-                os.remove(temp_path)
             return {"found": False, "message": f"Erreur de base de données: {str(e)}"}
         except Exception as e:
             logger.error(f"Erreur lors de la recherche de la personne: {e}")
-            # Nettoyer le fichier temporaire en cas d'erreur
-            if 'temp_path' in locals() and os.path.exists(temp_path):
-                os.remove(temp_path)
             return {"found": False, "message": f"Erreur interne: {str(e)}"}
     
+    def _match_embedding(self, embedding, threshold, include_image_data, top_k=5):
+        """
+        Recherche la personne correspondant à un embedding
+        
+        Args:
+            embedding: Embedding du visage à identifier
+            threshold: Seuil de similarité (0-1)
+            include_image_data: Si True, inclut la photo encodée en base64 dans le résultat
+            top_k: Nombre de candidats demandés à l'index vectoriel
+            
+        Returns:
+            dict: Résultat de la recherche
+        """
+        # Rechercher des visages similaires
+        matches = self.vector_store.search_similar(embedding, threshold, limit=top_k)
+        
+        if not matches:
+            return {"found": False, "message": "Aucune correspondance trouvée"}
+        
+        # Les identifiants ChromaDB sont les ID des personnes (id == vector_id ==
+        # metadata["person_id"] pour toutes les lignes, voir ck_person_vector_id_is_id)
+        candidate_ids = []
+        for match in matches:
+            try:
+                match["_id"] = uuid.UUID(match["id"])
+                candidate_ids.append(match["_id"])
+            except ValueError:
+                logger.warning(f"Identifiant ChromaDB invalide: {match['id']}")
+                match["_id"] = None
+        
+        # Charger toutes les personnes candidates en une seule requête
+        persons = Person.query.options(*self._blob_options(include_image_data, False)).filter(
+            Person.id.in_(candidate_ids),
+            Person.embedding_status == 'ready'
+        ).all() if candidate_ids else []
+        by_id = {person.id: person for person in persons}
+        
+        # Première correspondance présente en base, dans l'ordre de similarité décroissante
+        for match in matches:
+            person = by_id.get(match["_id"])
+            if person:
+                return {
+                    "found": True,
+                    "person": person.to_dict(include_image_data=include_image_data),
+                    "similarity": match["similarity"]
+                }
+        
+        logger.warning(f"Aucune personne trouvée dans la base de données malgré {len(matches)} correspondances dans ChromaDB")
+        
+        return {"found": False, "message": "Personne non trouvée dans la base de données"}
+    
+    def delete_all(self):
+        """
+        Supprime toutes les personnes et leurs embeddings
+        
+        Les embeddings sont supprimés par lots et les lignes en une seule requête,
+        dans une seule transaction. Sous PostgreSQL, TRUNCATE libère la table et ses
+        BLOB d'un coup, sans parcourir les lignes ni laisser de travail à VACUUM.
+        
+        Returns:
+            int: Nombre de personnes supprimées, ou None en cas d'erreur
+        """
+        try:
+            vector_ids = [str(vector_id) for vector_id, in db.session.query(Person.vector_id)]
+            
+            if vector_ids and not self.vector_store.delete_embeddings(vector_ids):
+                return None
+            
+            if db.session.get_bind().dialect.name == 'postgresql':
+                db.session.execute(db.text(f"TRUNCATE TABLE {Person.__table__.name}"))
+                count = len(vector_ids)
+            else:
+                count = Person.query.delete(synchronize_session=False)
+            db.session.commit()
+            self._invalidate_results()
+            
+            logger.info(f"{count} personne(s) supprimée(s)")
+            return count
+            
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error(f"Erreur de base de données lors de la suppression des personnes: {e}")
+            return None
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Erreur lors de la suppression des personnes: {e}")
+            return None
+    
+    def _invalidate_results(self):
+        """Vide le cache des résultats d'identification après une modification de la base"""
+        if self.result_cache is not None:
+            self.result_cache.clear()
+    
+    @staticmethod
+    def _blob_options(include_images, include_fingerprints):
+        """Options de chargement pour lire en une requête les BLOB demandés"""
+        options = []
+        if include_images:
+            options.append(undefer(Person.photo_data))
+        if include_fingerprints:
+            options.extend([
+                undefer(Person.fingerprint_right_data),
+                undefer(Person.fingerprint_left_data),
+                undefer(Person.fingerprint_thumbs_data)
+            ])
+        return options
+    
+    def iter_persons(self, include_images=False, include_fingerprints=False, batch_size=1000):
+        """
+        Parcourt toutes les personnes de la base par lots, sans charger la table en mémoire
+        
+        Args:
+            include_images: Si True, inclut les photos de visage encodées en base64
+            include_fingerprints: Si True, inclut aussi les empreintes digitales
+            batch_size: Nombre de lignes lues par lot (yield_per)
+        
+        Returns:
+            generator: Dictionnaires des personnes; les erreurs de base de données sont
+                       propagées (une réponse en flux doit être interrompue, pas tronquée)
+        """
+        persons = Person.query.options(
+            *self._blob_options(include_images, include_fingerprints)
+        ).yield_per(batch_size)
+        for person in persons:
+            yield person.to_dict(
+                include_image_data=include_images,
+                include_fingerprints=include_fingerprints
+            )
+    
     def get_all_persons(self, include_images=False, include_fingerprints=False):
         """
         Récupère toutes les personnes dans la base de données
@@ -257,11 +548,7 @@ class PersonService:
             list: Liste des personnes
         """
         try:
-            persons = Person.query.all()
-            return [person.to_dict(
-                include_image_data=include_images, 
-                include_fingerprints=include_fingerprints
-            ) for person in persons]
+            return list(self.iter_persons(include_images, include_fingerprints))
         except SQLAlchemyError as e:
             logger.error(f"Erreur de base de données lors de la récupération des personnes: {e}")
             return []
@@ -269,7 +556,7 @@ class PersonService:
             logger.error(f"Erreur lors de la récupération des personnes: {e}")
             return []
 
-    def get_person_by_id(self, person_id, include_images=True, include_fingerprints=True):
+    def get_person_by_id(self, person_id, include_images=False, include_fingerprints=False):
         """
         Récupère une personne par son ID
         
@@ -282,7 +569,11 @@ class PersonService:
             dict: Informations de la personne ou None
         """
         try:
-            person = Person.query.filter_by(id=person_id).first()
+            # Recherche par clé primaire (carte d'identité de la session consultée d'abord),
+            # avec les BLOB demandés chargés dans la même requête
+            person = db.session.get(
+                Person, person_id, options=self._blob_options(include_images, include_fingerprints)
+            )
             
             if not person:
                 return None
@@ -298,26 +589,6 @@ class PersonService:
             logger.error(f"Erreur lors de la récupération de la personne: {e}")
             return None
     
-    # def get_persons_with_fingerprints(self, include_images=False):
-    #     """Récupère toutes les personnes qui ont des empreintes digitales"""
-    #     try:
-    #         # Pour PostgreSQL, on utilise une syntaxe compatible
-    #         persons = Person.query.filter(
-    #             db.or_(
-    #                 Person.fingerprint_right_data.isnot(None),
-    #                 Person.fingerprint_left_data.isnot(None),
-    #                 Person.fingerprint_thumbs_data.isnot(None)
-    #             )
-    #         ).all()
-    #         
-    #         return [person.to_dict(include_image_data=include_images) for person in persons]
-    #     except SQLAlchemyError as e:
-    #         logger.error(f"Erreur de base de données lors de la récupération des personnes avec empreintes: {e}")
-    #         return []
-    #     except Exception as e:
-    #         logger.error(f"Erreur lors de la récupération des personnes avec empreintes: {e}")
-    #         return []
-
     def get_persons_with_fingerprints(self, include_images=False, include_fingerprints=False):
         """
         Récupère toutes les personnes qui ont des empreintes digitales
@@ -330,18 +601,21 @@ class PersonService:
             list: Liste des personnes avec empreintes
         """
         try:
-            # Pour PostgreSQL, on utilise une syntaxe compatible
-            persons = Person.query.filter(
+            # Même condition que l'index partiel ix_person_with_fingerprints; lecture par lots
+            # pour ne pas garder en mémoire tous les objets (et leurs BLOB) à la fois
+            persons = Person.query.options(
+                *self._blob_options(include_images, include_fingerprints)
+            ).filter(
                 db.or_(
                     Person.fingerprint_right_data.isnot(None),
                     Person.fingerprint_left_data.isnot(None),
                     Person.fingerprint_thumbs_data.isnot(None)
                 )
-            ).all()
+            ).yield_per(500)
             
             return [person.to_dict(
                 include_image_data=include_images,
-                include_fingerprints=include_fingerprints  # Ajout du paramètre
+                include_fingerprints=include_fingerprints
             ) for person in persons]
         except Exception as e:
             logger.error(f"Erreur lors de la récupération des personnes avec empreintes: {e}")
@@ -351,17 +625,21 @@ class PersonService:
     def delete_person(self, person_id):
         """Supprime une personne et son embedding"""
         try:
-            person = Person.query.filter_by(id=person_id).first()
-            
-            if not person:
+            # Supprimer la ligne et récupérer son vector_id en un seul aller-retour
+            # (DELETE ... RETURNING), sans charger l'objet Person
+            vector_id = db.session.execute(
+                db.delete(Person).where(Person.id == person_id).returning(Person.vector_id)
+            ).scalar_one_or_none()
+            
+            if vector_id is None:
+                db.session.rollback()
                 return False
             
             # Supprimer l'embedding
-            self.vector_store.delete_embedding(person.vector_id)
+            self.vector_store.delete_embedding(str(vector_id))
             
-            # Supprimer la personne
-            db.session.delete(person)
             db.session.commit()
+            self._invalidate_results()
             
             logger.info(f"Personne supprimée avec succès: {person_id}")
             return True
@@ -1,3 +1,4 @@
+import io
 import os
 import uuid
 import logging
@@ -25,26 +26,26 @@ def save_image(file, upload_folder, allowed_extensions):
     """
     try:
         if file and allowed_file(file.filename, allowed_extensions):
-            # Sécuriser le nom de fichier
-            original_filename = secure_filename(file.filename)
-            # Générer un nom unique
-            unique_filename = f"{uuid.uuid4()}_{original_filename}"
+            # Sécuriser le nom de fichier (secure_filename peut renvoyer une chaîne vide)
+            original_filename = secure_filename(file.filename) or f"image.{get_file_extension(file.filename)}"
+            # Générer un nom unique (32 caractères hexadécimaux, sans tirets)
+            unique_filename = f"{uuid.uuid4().hex}_{original_filename}"
             file_path = os.path.join(upload_folder, unique_filename)
             
-            # Sauvegarder le fichier
-            file.save(file_path)
-            
-            # Vérifier que c'est bien une image valide
+            # Vérifier en mémoire que c'est bien une image valide, avant toute écriture:
+            # un fichier invalide ne touche jamais le disque
+            data = file.read()
             try:
-                with Image.open(file_path) as img:
-                    img.verify()  # Vérifie que l'image est valide
-                return file_path
+                with Image.open(io.BytesIO(data)) as img:
+                    img.verify()
             except Exception as e:
-                # Si ce n'est pas une image valide, supprimer le fichier
-                if os.path.exists(file_path):
-                    os.remove(file_path)
                 logger.error(f"Le fichier n'est pas une image valide: {e}")
                 return None
+            
+            # Sauvegarder le fichier en une seule écriture
+            with open(file_path, 'wb') as f:
+                f.write(data)
+            return file_path
         else:
             logger.error(f"Extension de fichier non autorisée: {file.filename}")
             return None
@@ -0,0 +1,40 @@
+import decimal
+import orjson
+from flask.json.provider import JSONProvider
+
+def _default(o):
+    """Types non gérés nativement par orjson (mêmes conversions que le fournisseur par défaut de Flask)"""
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+# Options orjson communes aux réponses et aux flux JSON
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def dumps_bytes(obj):
+    """Sérialise un objet en JSON (bytes), avec les mêmes conversions que les réponses jsonify"""
+    return orjson.dumps(obj, default=_default, option=OPTIONS)
+
+class ORJSONProvider(JSONProvider):
+    """
+    Fournisseur JSON basé sur orjson pour jsonify et les réponses Flask
+    
+    orjson sérialise nativement les datetime (ISO 8601), les UUID et les
+    tableaux NumPy, sans passer par des appels isoformat() ou tolist().
+    """
+    
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        # Transmettre directement les bytes produits par orjson, sans décodage
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            dumps_bytes(obj),
+            mimetype='application/json'
+        )
@@ -0,0 +1,87 @@
+import tempfile
+from flask import abort, current_app, request
+from werkzeug.datastructures import FileStorage
+from streaming_form_data import ParseFailedException, StreamingFormDataParser
+from streaming_form_data.targets import BaseTarget, ValueTarget
+
+# Taille par défaut des blocs lus depuis le flux de la requête (MULTIPART_CHUNK_SIZE)
+CHUNK_SIZE = 1024 * 1024
+# Taille par défaut au-delà de laquelle un fichier téléchargé est écrit sur disque
+# plutôt qu'en mémoire (MULTIPART_SPOOL_SIZE)
+SPOOL_MAX_SIZE = 1024 * 1024
+
+class SpooledFileTarget(BaseTarget):
+    """Cible streaming-form-data qui écrit un fichier dans un SpooledTemporaryFile"""
+    
+    def __init__(self, max_size=SPOOL_MAX_SIZE, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.file = tempfile.SpooledTemporaryFile(max_size=max_size)
+    
+    def on_data_received(self, chunk):
+        self.file.write(chunk)
+    
+    def to_file_storage(self, name):
+        """Renvoie le fichier reçu sous forme de FileStorage, ou None si le champ est absent"""
+        if self.multipart_filename is None:
+            self.file.close()
+            return None
+        self.file.seek(0)
+        return FileStorage(
+            stream=self.file,
+            filename=self.multipart_filename,
+            name=name,
+            content_type=self.multipart_content_type
+        )
+
+def parse_multipart(file_fields, text_fields):
+    """
+    Analyse le corps multipart de la requête courante avec streaming-form-data
+    
+    Le parseur (en C) traite le flux par blocs de MULTIPART_CHUNK_SIZE, sans passer par le
+    parseur multipart de Werkzeug. Les requêtes non multipart sont renvoyées telles
+    que Flask les a analysées.
+    
+    Args:
+        file_fields: Noms des champs fichiers attendus
+        text_fields: Noms des champs texte attendus
+        
+    Returns:
+        tuple: (dict des champs texte, dict des FileStorage)
+        
+    Un corps mal formé (boundary absente, délimiteurs ou en-têtes de partie invalides,
+    texte non UTF-8) donne une erreur 400, comme avec le parseur de Werkzeug.
+    """
+    if request.mimetype != 'multipart/form-data':
+        return request.form, request.files
+    
+    config = current_app.config
+    spool_size = config.get('MULTIPART_SPOOL_SIZE', SPOOL_MAX_SIZE)
+    values = {name: ValueTarget() for name in text_fields}
+    files = {name: SpooledFileTarget(spool_size) for name in file_fields}
+    
+    try:
+        parser = StreamingFormDataParser(headers=request.headers)
+        for name, target in {**values, **files}.items():
+            parser.register(name, target)
+        
+        chunk_size = config.get('MULTIPART_CHUNK_SIZE', CHUNK_SIZE)
+        stream = request.stream
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            parser.data_received(chunk)
+        
+        form = {name: target.value.decode('utf-8') for name, target in values.items() if target.value}
+    except (ParseFailedException, UnicodeDecodeError) as e:
+        for target in files.values():
+            target.file.close()
+        abort(400, f"Corps multipart invalide: {e}")
+    
+    uploads = {}
+    for name, target in files.items():
+        file_storage = target.to_file_storage(name)
+        if file_storage is not None:
+            uploads[name] = file_storage
+    
+    return form, uploads
@@ -0,0 +1,105 @@
+# utils/sim_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+class SimilarityCache:
+    """
+    Cache LRU de résultats d'identification indexé par similarité d'embedding
+
+    Une requête dont l'embedding est à une distance cosinus <= max_distance d'un
+    embedding récemment recherché (ex: images successives d'une webcam) reçoit le
+    résultat mis en cache, sans recherche vectorielle ni requête SQL.
+    """
+
+    def __init__(self, capacity=256, max_distance=0.02, ttl=30.0):
+        """
+        Args:
+            capacity: Nombre maximal de résultats conservés
+            max_distance: Distance cosinus maximale (1 - similarité) pour un succès
+            ttl: Durée de validité d'un résultat en secondes; borne l'obsolescence des
+                 résultats lorsque la base est modifiée par un autre processus
+        """
+        self.capacity = capacity
+        self.min_similarity = 1.0 - max_distance
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        # Embeddings normalisés des entrées, une ligne par emplacement
+        self._matrix = None
+        # emplacement -> (clé, résultat, expiration), dans l'ordre d'utilisation
+        self._entries = OrderedDict()
+        self._free = list(range(capacity))
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.array(embedding, dtype=np.float32)
+        vector /= np.linalg.norm(vector) + 1e-12
+        return vector
+
+    def get(self, embedding, key):
+        """
+        Renvoie le résultat mis en cache pour un embedding proche, ou None
+
+        Args:
+            embedding: Embedding de la requête
+            key: Paramètres de la requête (le résultat n'est réutilisé que pour la même clé)
+        """
+        query = self._normalize(embedding)
+        now = time.monotonic()
+
+        with self._lock:
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            slots = np.fromiter(self._entries.keys(), dtype=np.intp, count=len(self._entries))
+            similarities = self._matrix[slots] @ query
+            close = np.nonzero(similarities >= self.min_similarity)[0]
+
+            for i in close[np.argsort(-similarities[close])].tolist():
+                slot = int(slots[i])
+                entry_key, result, expires = self._entries[slot]
+                if entry_key == key and expires > now:
+                    self._entries.move_to_end(slot)
+                    self.hits += 1
+                    return result
+
+            self.misses += 1
+            return None
+
+    def put(self, embedding, key, result):
+        """Enregistre un résultat, en évinçant l'entrée la moins récemment utilisée"""
+        vector = self._normalize(embedding)
+
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot, _ = self._entries.popitem(last=False)
+
+            self._matrix[slot] = vector
+            self._entries[slot] = (key, result, time.monotonic() + self.ttl)
+
+    def clear(self):
+        """Invalide toutes les entrées (à appeler après une modification de la base)"""
+        with self._lock:
+            self._entries.clear()
+            self._free = list(range(self.capacity))
+
+    def stats(self):
+        """Renvoie les statistiques du cache"""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses
+            }